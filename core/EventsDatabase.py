@@ -1,6 +1,11 @@
+import hashlib
 import json
+import os
+import pickle
+import shutil
 from pathlib import Path
-from rapidfuzz import fuzz
+from collections import Counter
+from rapidfuzz import fuzz, process
 
 from utils.log import info, warning, error, debug
 from utils.strings import clean_event_name 
@@ -15,6 +20,22 @@ SUPPORT_EVENT_DATABASE = {}
 SCENARIOS_EVENT_DATABASE = {}
 EVENT_CHOICES_MAP = {}
 
+# fuzzy lookup index over ALL_EVENT_KEYS, rebuilt with it
+_EVENT_KEY_LIST: list[str] = []
+_TRIGRAM_INDEX: dict[str, list[int]] = {}
+# OCR'd name -> resolved key (or None), kept until the databases are reloaded
+_RESOLVED: dict[tuple[str, float], str | None] = {}
+# share of the query's trigrams a key needs before it gets scored
+MIN_TRIGRAM_OVERLAP = 0.3
+
+# parsed + indexed copies of the JSON files, keyed by the source's content hash
+CACHE_DIR = "cache/events"
+CACHE_VERSION = 2
+# characters.json and scenarios.json are split into one shard per character/scenario,
+# support-style top-level events go in the ungrouped shard
+UNGROUPED_SHARD = "ungrouped"
+ALL_SHARD = "all"
+
 def load_event_databases():
     global EVENT_CHOICES_MAP
     # hard reset all indices and views
@@ -65,8 +86,34 @@ def index_json(path: str, group_filter: str | None = None) -> dict:
         return {}
 
     gfilter = (group_filter or "").strip().casefold()
-    data = json.loads(p.read_text(encoding="utf-8"))
+    digest = _source_digest(p)
+    # a filtered load only unpickles the shards it needs: its own group plus the ungrouped events
+    names = [_shard_name(gfilter), UNGROUPED_SHARD] if gfilter else [ALL_SHARD]
+    shards = [None]
+    # the "all" shard is written last, once it exists a missing shard just means an empty group
+    if os.path.isfile(_shard_path(p, digest, ALL_SHARD)):
+        paths = [_shard_path(p, digest, name) for name in names]
+        shards = [_load_cache(path) if os.path.isfile(path) else () for path in paths]
+
+    if any(shard is None for shard in shards):
+        data = json.loads(p.read_text(encoding="utf-8"))
+        built = _write_shards(p, digest, data)
+        shards = [built.get(name, ()) for name in names]
+
     result = {}
+    for shard in shards:
+        if not shard:
+            continue
+        events, character_by_event, totals, hints = shard
+        result.update(events)
+        CHARACTER_BY_EVENT.update(character_by_event)
+        EVENT_TOTALS.update(totals)
+        SKILL_HINT_BY_EVENT.update(hints)
+    return result
+
+def _index_data(data: dict):
+    """(events by normalized key, character by event, choice totals, skill hints) for one JSON file."""
+    result, character_by_event, totals, skill_hints = {}, {}, {}, {}
 
     for key, val in data.items():
         # support-style: top-level key is an event
@@ -77,15 +124,13 @@ def index_json(path: str, group_filter: str | None = None) -> dict:
             # character-style: top-level key is a character
             group_name = key
             events = val if isinstance(val, dict) else {}
-            if gfilter and group_name.strip().casefold() != gfilter:
-                continue  # skip not trainee and scenario
 
         for raw_name, payload in (events or {}).items():
             ev_key = clean_event_name(raw_name)
 
             # indexes
-            CHARACTER_BY_EVENT[ev_key] = group_name  # None for supports
-            EVENT_TOTALS[ev_key] = len((payload or {}).get("choices", {}))
+            character_by_event[ev_key] = group_name  # None for supports
+            totals[ev_key] = len((payload or {}).get("choices", {}))
 
             hints = {}
             for k, s in ((payload or {}).get("stats") or {}).items():
@@ -97,11 +142,86 @@ def index_json(path: str, group_filter: str | None = None) -> dict:
                 if hint:
                     hints[idx] = hint
             if hints:
-                SKILL_HINT_BY_EVENT[ev_key] = hints
+                skill_hints[ev_key] = hints
 
             result[ev_key] = payload
 
-    return result
+    return result, character_by_event, totals, skill_hints
+
+def _source_digest(p: Path) -> str:
+    """Content hash of a source file, only re-hashed when its size or mtime changed."""
+    st = p.stat()
+    stamp = [st.st_size, st.st_mtime_ns]
+    sources_file = os.path.join(CACHE_DIR, "sources.json")
+    try:
+        with open(sources_file, encoding="utf-8") as f:
+            sources = json.load(f)
+    except (OSError, ValueError):
+        sources = {}
+
+    key = str(p.resolve())
+    known = sources.get(key)
+    if known and known.get("stamp") == stamp:
+        return known["digest"]
+
+    digest = hashlib.sha1(p.read_bytes()).hexdigest()[:16]
+    sources[key] = {"stamp": stamp, "digest": digest}
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(sources_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(sources, f)
+        os.replace(sources_file + ".tmp", sources_file)
+    except OSError as e:
+        warning(f"Couldn't write {sources_file}: {e}")
+    return digest
+
+def _shard_name(group: str) -> str:
+    return hashlib.sha1(group.encode("utf-8")).hexdigest()[:12]
+
+def _shard_path(p: Path, digest: str, name: str) -> str:
+    return os.path.join(CACHE_DIR, f"{p.stem}-{digest}-v{CACHE_VERSION}", f"{name}.pickle")
+
+def _write_shards(p: Path, digest: str, data: dict) -> dict:
+    """
+    Index data once per group and pickle each group on its own, so the next start only loads
+    the one it needs. Returns {shard name: indexed shard}.
+    """
+    groups = {}
+    for key, val in data.items():
+        if isinstance(val, dict) and "choices" in val and "stats" in val:
+            groups.setdefault(UNGROUPED_SHARD, {})[key] = val
+        else:
+            groups.setdefault(_shard_name(key.strip().casefold()), {})[key] = val
+
+    built = {name: _index_data(part) for name, part in groups.items()}
+    built[ALL_SHARD] = _index_data(data)
+
+    folder = os.path.dirname(_shard_path(p, digest, ALL_SHARD))
+    try:
+        # shards of an older version of the file are dead once the source changed
+        if os.path.isdir(CACHE_DIR):
+            for old in os.listdir(CACHE_DIR):
+                if old.startswith(p.stem + "-") and os.path.join(CACHE_DIR, old) != folder:
+                    shutil.rmtree(os.path.join(CACHE_DIR, old), ignore_errors=True)
+        os.makedirs(folder, exist_ok=True)
+        for name in sorted(built, key=lambda name: name == ALL_SHARD):
+            cache_file = _shard_path(p, digest, name)
+            with open(cache_file + ".tmp", "wb") as f:
+                pickle.dump(built[name], f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(cache_file + ".tmp", cache_file)
+    except OSError as e:
+        warning(f"Couldn't write event cache {folder}: {e}")
+    return built
+
+def _load_cache(cache_file: str):
+    if not os.path.isfile(cache_file):
+        return None
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        warning(f"Ignoring broken event cache {cache_file}: {e}")
+        return None
 
 def dump_event(event_name: str):
     """Print choices + stats for a single event name."""
@@ -115,23 +235,61 @@ def dump_event(event_name: str):
     for idx, row in (payload.get('stats') or {}).items():
         info(f"choice {idx}: {row}")
 
-def find_closest_event(event_name, event_list, threshold=0.7):
+def _trigrams(text: str) -> set[str]:
+    # per word, so the word order doesn't matter (same as token_sort_ratio)
+    grams = set()
+    for word in text.lower().split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _build_event_index() -> None:
+    _EVENT_KEY_LIST[:] = sorted(ALL_EVENT_KEYS)
+    _TRIGRAM_INDEX.clear()
+    for i, key in enumerate(_EVENT_KEY_LIST):
+        for gram in _trigrams(key):
+            _TRIGRAM_INDEX.setdefault(gram, []).append(i)
+    _RESOLVED.clear()
+
+def _candidates(event_name: str) -> list[str]:
+    grams = _trigrams(event_name)
+    counts = Counter()
+    for gram in grams:
+        counts.update(_TRIGRAM_INDEX.get(gram, ()))
+    needed = max(1, int(len(grams) * MIN_TRIGRAM_OVERLAP))
+    found = [_EVENT_KEY_LIST[i] for i, n in counts.items() if n >= needed]
+    return found or _EVENT_KEY_LIST
+
+def find_closest_event(event_name, event_list=None, threshold=0.7):
+    """
+    Closest known event key for an OCR'd name, None below threshold.
+    Uses the trigram index over ALL_EVENT_KEYS unless another event_list is given.
+    """
     if not event_name:
         return None
 
-    best_match, training_score = None, 0
-    for db_event in event_list:
-        score = fuzz.token_sort_ratio(event_name.lower(), db_event.lower()) / 100
-        if score > training_score:
-            training_score = score
-            best_match = db_event
-    return best_match if training_score >= threshold else None
+    if event_list is not None and event_list is not ALL_EVENT_KEYS:
+        match = process.extractOne(event_name.lower(), list(event_list), scorer=fuzz.token_sort_ratio,
+                                   processor=str.lower, score_cutoff=threshold * 100)
+        return match[0] if match else None
+
+    cache_key = (event_name, threshold)
+    if cache_key in _RESOLVED:
+        return _RESOLVED[cache_key]
+
+    match = process.extractOne(event_name.lower(), _candidates(event_name), scorer=fuzz.token_sort_ratio,
+                               processor=str.lower, score_cutoff=threshold * 100)
+    best_match = match[0] if match else None
+    _RESOLVED[cache_key] = best_match
+    return best_match
 
 def rebuild_all_event_keys() -> None:
     """Recompute the global set of normalized event keys."""
-    global ALL_EVENT_KEYS
-    ALL_EVENT_KEYS = set().union(
+    # updated in place, other modules import the set itself
+    ALL_EVENT_KEYS.clear()
+    ALL_EVENT_KEYS.update(
         CHARACTERS_EVENT_DATABASE.keys(),
         SUPPORT_EVENT_DATABASE.keys(),
         SCENARIOS_EVENT_DATABASE.keys()
-    )
\ No newline at end of file
+    )
+    _build_event_index()
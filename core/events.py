@@ -8,9 +8,10 @@ from core.EventsDatabase import CHARACTERS_EVENT_DATABASE, SUPPORT_EVENT_DATABAS
 from core.EventsDatabase import find_closest_event
 from core.logic import get_stat_priority
 from core.special_events import run_special_event
-from core.state import check_energy_level, stop_bot,check_mood
+from core.state import check_energy_level, stop_bot, check_mood, TurnState
+from types import MappingProxyType
 
-def get_optimal_choice(event_name: str):
+def get_optimal_choice(event_name: str, trainer: TurnState = None):
     choice = 0
     key = clean_event_name(event_name)
     
@@ -54,7 +55,7 @@ def get_optimal_choice(event_name: str):
         result_hint = pick_choice_by_skill_hint(key, {s.casefold() for s in (state.DESIRE_SKILL or [])})
         if result_hint is not None:
             return result_hint
-        return pick_choice_by_score(key, db)
+        return pick_choice_by_score(key, db, trainer)
 
     warning(f"No match found for {event_name}. Defaulting to top choice.")
     return choice
@@ -90,10 +91,42 @@ def _f(x, default=0.0):
     except Exception:
         return float(default)
 
-def score_choice(choice_row):
-    current_stats = state.CURRENT_STATS or {}
-    choice_weight = state.CHOICE_WEIGHT
-    caps = state.STAT_CAPS
+def read_event_state() -> TurnState:
+    """
+    Energy and mood read once for the whole event, everything else comes from the lobby snapshot.
+    A failed read keeps the lobby value.
+    """
+    energy_level, max_energy = check_energy_level()
+    mood = check_mood()
+    lobby = state.TURN_STATE
+
+    if lobby is None:
+        return TurnState(
+            energy=energy_level, max_energy=max_energy,
+            mood=mood, mood_index=constants.MOOD_LIST.index(mood),
+            turn=None, year=state.CURRENT_YEAR, criteria=state.CRITERIA, virtual_turn=state.VIRTUAL_TURN,
+            stats=MappingProxyType(dict(state.CURRENT_STATS or {})),
+        )
+
+    changes = {}
+    if max_energy > 0:
+        changes.update(energy=energy_level, max_energy=max_energy)
+    if mood != "UNKNOWN":
+        changes.update(mood=mood, mood_index=constants.MOOD_LIST.index(mood))
+    return lobby.with_values(**changes)
+
+def scoring_settings():
+    """Config values score_choice needs: (choice weights, stat caps, priority bonus per stat)."""
+    stats = ("spd", "sta", "pwr", "guts", "wit")
+    if state.USE_PRIORITY_ON_CHOICE:
+        priority_bonus = {k: state.PRIORITY_EFFECTS_LIST[get_stat_priority(k)] for k in stats}
+    else:
+        priority_bonus = {k: 0.0 for k in stats}
+    return state.CHOICE_WEIGHT, state.STAT_CAPS, priority_bonus
+
+def score_choice(choice_row, trainer: TurnState, choice_weight, caps, priority_bonus):
+    """Score one row of an event's choice table. Pure, no screen reads: trainer is read once per event."""
+    current_stats = trainer.stats or {}
 
     score = 0.0
 
@@ -117,16 +150,12 @@ def score_choice(choice_row):
         else:
             norm = 0.5
 
-        if state.USE_PRIORITY_ON_CHOICE:
-            priority_bonus = state.PRIORITY_EFFECTS_LIST[get_stat_priority(k_map)]
-            multiplier = 1.0 + priority_bonus
-        else:
-            multiplier = 1.0
+        multiplier = 1.0 + priority_bonus.get(k_map, 0.0)
 
         score += choice_weight[k_map] * multiplier * norm * gain
 
     # 2) HP (Energy)
-    energy_level, max_energy = check_energy_level()
+    energy_level, max_energy = trainer.energy, trainer.max_energy
     energy_gain = _f(choice_row.get("HP", 0), 0.0)
 
     if max_energy > 0 and energy_gain != 0:
@@ -153,8 +182,7 @@ def score_choice(choice_row):
             score += choice_weight["hp"] * energy_gain * hp_penalty_mult
 
     # 3) Mood
-    mood = check_mood()
-    mood_index = constants.MOOD_LIST.index(mood)
+    mood_index = trainer.mood_index
     mood_gain = _f(choice_row.get("Mood", 0), 0.0)
     if mood_gain != 0:
         if mood_gain > 0:
@@ -177,9 +205,16 @@ def score_choice(choice_row):
 
     return score
 
-def pick_choice_by_score(key: str, db: dict):
+def pick_choice_by_score(key: str, db: dict, trainer: TurnState = None):
     payload = db.get(key) or {}
     stats = payload.get("stats") or {}
+    if not stats:
+        return 1
+
+    # one read for the whole table instead of one per row
+    if trainer is None:
+        trainer = read_event_state()
+    settings = scoring_settings()
 
     best_idx, best_score = 1, float("-inf")
     for idx, row in stats.items():
@@ -190,7 +225,7 @@ def pick_choice_by_score(key: str, db: dict):
         if not isinstance(row, dict):
             continue
 
-        score = score_choice(row)
+        score = score_choice(row, trainer, *settings)
         debug(f"[Score] {key} -> choice {i}: {score:.3f}")
 
         if score > best_score:
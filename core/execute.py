@@ -1,40 +1,28 @@
 import pyautogui
-from PIL import ImageGrab
 
 pyautogui.useImageNotFoundException(False)
 
 import core.state as state
-from core.state import check_turn, check_mood, check_current_year, check_criteria, check_energy_level, check_unity, stop_bot, check_stats, get_virtual_turn, check_credit
+from core.state import check_unity, stop_bot, check_credit
 
 from utils.log import info, warning, error, debug
 import utils.constants as constants
 
 from utils.log import info, warning, error, debug
-from core.recognizer import is_btn_active, match_template, multi_match_templates
+from core.recognizer import is_btn_active, match_template
+from core.screens import classify_screen, screen_changed, reset_screen_cache
+from core.skill import reset_skill_cache
 from utils.process import event_choice, check_fan, race_process, after_race
 from utils.tools import click, sleep, wait_for_image, get_secs
+from utils.screenshot import refresh_frame
+import utils.metrics as metrics
+from utils.recorder import start_recording, stop_recording, is_recording, record
 
 from logic.ura import ura_logic
 from logic.unity import unity_logic, unity_race
 
-templates = {
-  "event": "assets/icons/event_choice_1.png",
-  "acupuncture_accept": "assets/icons/acupuncture_confirm.png",
-  "inspiration": "assets/buttons/inspiration_btn.png",
-  "next": "assets/buttons/next_btn.png",
-  "next2": "assets/buttons/next2_btn.png",
-  "cancel": "assets/buttons/cancel_btn.png",
-  "tazuna": "assets/ui/tazuna_hint.png",
-  "infirmary": "assets/buttons/infirmary_btn.png",
-  "retry": "assets/buttons/retry_btn.png",
-  "close": "assets/unity_cup/close_btn.png",
-  "complete": "assets/buttons/complete_btn.png",
-  "view_result":"assets/buttons/view_results.png",
-  "back_btn":"assets/buttons/back_btn.png",
-  "retry": "assets/buttons/retry_btn.png",
-  "claw_credit": "assets/buttons/claw_credit.png",
-  "claw_result": "assets/buttons/claw_result.png",
-}
+# pause between ticks while the screen stays still on a screen the bot doesn't act on
+IDLE_SLEEP = 0.2
 
 def career_lobby():
   # Program start
@@ -42,46 +30,64 @@ def career_lobby():
   state.DONE_DEBUT = False
   state.FAN_COUNT = -1
   state.APTITUDES = {}
+  reset_screen_cache()
+  reset_skill_cache()
+  metrics.reset_career()
+  if state.RECORD_FRAMES:
+    start_recording(state.RECORD_DIR)
+  else:
+    stop_recording()
+  idle = False
   while state.is_bot_running and not state.stop_event.is_set():
-    screen = ImageGrab.grab()
-    matches = multi_match_templates(templates, screen=screen)
+    # one capture per tick, every reader below crops from it until the UI changes
+    screen = refresh_frame()
+    # nothing to do last tick and nothing moved since, don't recognize the same frame again
+    if not screen_changed(screen) and idle:
+      sleep(IDLE_SLEEP)
+      continue
+    idle = False
+
+    # first screen found in priority order, the rest of the templates are never matched
+    current_screen, boxes = classify_screen(screen)
 
-    if matches["complete"]:
+    if current_screen == "complete":
         stop_bot()
         info("Career complete. Stop bot")
-    if click(boxes=matches["acupuncture_accept"]):
+        continue
+    if current_screen == "acupuncture_accept" and click(boxes=boxes):
       continue
-    if event_choice():
+    if current_screen == "event" and event_choice():
       continue
-    if check_unity():
+    unity_round = check_unity(frame=screen)
+    if unity_round:
       info("Unity Race Day")
-      unity_race()
+      unity_race(unity_round)
       continue
-    if click(boxes=matches["inspiration"], text="Inspiration found."):
+    if current_screen == "inspiration" and click(boxes=boxes, text="Inspiration found."):
       continue
-    if matches["view_result"]:
+    if current_screen == "view_result":
       race_process()
       continue
-    if click(boxes=matches["next"], text="next"):
+    if current_screen == "next" and click(boxes=boxes, text="next"):
       continue
-    if click(boxes=matches["next2"], text="next2"):
+    if current_screen == "next2" and click(boxes=boxes, text="next2"):
       continue
-    if matches["cancel"]:
+    if current_screen == "cancel":
       clock_icon = match_template("assets/icons/clock_icon.png", threshold=0.8)
       if clock_icon:
         stop_bot()
         info("Lost race, Stopping the bot.")
         continue
       else:
-        click(boxes=matches["cancel"])
+        click(boxes=boxes)
         continue
-    if click(boxes=matches["retry"], text="retry"):
+    if current_screen == "retry" and click(boxes=boxes, text="retry"):
       continue
-    if click(boxes=matches["close"], text="close"):
+    if current_screen == "close" and click(boxes=boxes, text="close"):
       continue
-    if click(boxes=matches["back_btn"], text="back"):
+    if current_screen == "back_btn" and click(boxes=boxes, text="back"):
       continue
-    if matches["claw_credit"]:
+    if current_screen == "claw_credit":
       credits = check_credit()
       if credits == "CREDIT 3":
         click_and_hold(img="assets/buttons/claw_btn.png", text="Claw 1 found.", duration_ms=1888)
@@ -95,36 +101,23 @@ def career_lobby():
         click_and_hold(img="assets/buttons/claw_btn.png", text="Claw 3 found.", duration_ms=490)
         sleep(5)
         continue
-    if matches["claw_result"]:
+    if current_screen == "claw_result":
       click(img="assets/buttons/ok_2_btn.png", minSearch=get_secs(0.7))
       continue
 
-    if not matches["tazuna"]:
+    if current_screen != "tazuna":
       #info("Should be in career lobby.")
       print(".", end="")
+      idle = True
       continue
 
-    energy_level, max_energy = check_energy_level()
+    turn_state = state.read_turn_state()
 
-    mood = check_mood()
-    mood_index = constants.MOOD_LIST.index(mood)
-    turn = check_turn()
-    year = check_current_year()
-    criteria = check_criteria()
-    virtual_turn = get_virtual_turn(year, criteria)
-    current_stats = check_stats()
-
-    if (not state.DONE_DEBUT or state.FAN_COUNT == -1) and year != "Junior Year Pre-Debut":
+    if (not state.DONE_DEBUT or state.FAN_COUNT == -1) and turn_state.year != "Junior Year Pre-Debut":
       check_fan()
+      turn_state = turn_state.with_values(fan_count=state.FAN_COUNT, done_debut=state.DONE_DEBUT)
 
-    state.CURRENT_ENERGY_LEVEL = energy_level
-    state.MAX_ENERGY = max_energy
-    state.CURRENT_MOOD_INDEX = mood_index
-    state.CURRENT_STATS = current_stats
-    state.CURRENT_YEAR = year
-    state.CURRENT_TURN_LEFT = turn
-    state.CRITERIA = criteria
-    state.VIRTUAL_TURN = virtual_turn
+    state.set_turn_state(turn_state)
 
     if state.DONE_DEBUT:
         debut_status = "Finish"
@@ -134,24 +127,30 @@ def career_lobby():
     state.FORCE_REST = False
     state.TRAINING_RESTRICTED = False
 
+    # to_dict copies the stats, only build it when the tick is saved
+    if is_recording():
+      record("lobby", screen, turn_state.to_dict())
+
     print("\n=======================================================================================\n")
     info(f"Trainee: {state.TRAINEE_NAME}")
     info(f"Scenario: {state.SCENARIO_NAME}")
     print("\n=======================================================================================\n")
-    info(f"Turn: {virtual_turn}")
-    info(f"Year: {year}")
-    info(f"Mood: {mood}")
-    info(f"Turn Left: {turn}")
-    info(f"Criteria: {criteria}")
+    info(f"Turn: {turn_state.virtual_turn}")
+    info(f"Year: {turn_state.year}")
+    info(f"Mood: {turn_state.mood}")
+    info(f"Turn Left: {turn_state.turn}")
+    info(f"Criteria: {turn_state.criteria}")
     print("\n=======================================================================================\n")
     info(f"Debut Status: {debut_status}")
     info(f"fans: {state.FAN_COUNT}")
     print("\n=======================================================================================\n")
 
     if "URA" in state.SCENARIO_NAME:
-        ura_logic()
+        ura_logic(turn_state)
 
     if "Unity" in state.SCENARIO_NAME:
-        unity_logic()
-    
+        unity_logic(turn_state)
+
+    # everything timed since the last lobby read belongs to this turn
+    metrics.end_turn(f"{turn_state.year} / {turn_state.virtual_turn}")
     continue
\ No newline at end of file
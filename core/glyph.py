@@ -0,0 +1,240 @@
+import hashlib
+import os
+import threading
+import cv2
+import numpy as np
+
+from utils.log import info, warning, error, debug
+
+# Per-digit glyph templates, one folder per field kind (stat, turn, skill_pts, skill_cost, failure).
+# Files are named <char>_<n>.png, "%" is stored as "pct".
+GLYPH_DIR = "assets/digits"
+GLYPH_SIZE = (12, 18)  # (width, height) every glyph is normalized to
+MIN_SCORE = 0.85
+DIGITS = "0123456789"
+MAX_SAMPLES = 3
+# OCR reads that have to agree on a glyph, each from a different strip, before it is saved
+AGREE_READS = 3
+MAX_PENDING = 200
+
+# field kind -> text polarity on screen
+GLYPH_SETS = {
+  "stat": "dark",
+  "turn": "dark",
+  "skill_pts": "dark",
+  "skill_cost": "dark",
+  "failure": "light",
+}
+
+# field kind -> plausible values, OCR reads outside the range are never learned from
+VALUE_RANGES = {
+  "stat": (1, 2000),
+  "turn": (1, 49),
+  "skill_pts": (0, 9999),
+  "skill_cost": (1, 999),
+  "failure": (0, 100),
+}
+
+_FILE_CHAR = {"pct": "%"}
+_CHAR_FILE = {v: k for k, v in _FILE_CHAR.items()}
+
+# set name -> (labels, matrix of normalized glyph vectors)
+_sets = {}
+# set name -> glyphs seen in OCR reads but not saved yet, see learn_number
+_pending = {}
+_learn_lock = threading.Lock()
+# off while replaying recordings, reads must not change the templates they are measured with
+_learning = True
+
+def _binarize(img, polarity):
+  if img.ndim == 3:
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+  if polarity == "light":
+    _, binary = cv2.threshold(img, 200, 255, cv2.THRESH_BINARY)
+  else:
+    _, binary = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+  return binary
+
+def segment(img, polarity="dark"):
+  """Split a number strip into glyph crops, left to right."""
+  binary = _binarize(img, polarity)
+  n, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+  if n <= 1:
+    return []
+
+  # merge components that overlap horizontally ("%" and broken strokes),
+  # anything spanning the whole strip height is background, not a glyph
+  height, width = binary.shape[:2]
+  boxes = sorted(
+    (int(x), int(y), int(w), int(h)) for x, y, w, h, area in stats[1:]
+    if area >= 2 and not (h >= height - 1 and w >= width * 0.5)
+  )
+  if not boxes:
+    return []
+  merged = []
+  for x, y, w, h in boxes:
+    if merged:
+      mx, my, mw, mh = merged[-1]
+      if x < mx + mw - 1:
+        right, bottom = max(mx + mw, x + w), max(my + mh, y + h)
+        top = min(my, y)
+        merged[-1] = (mx, top, right - mx, bottom - top)
+        continue
+    merged.append((x, y, w, h))
+
+  tallest = max(h for _, _, _, h in merged)
+  merged = [b for b in merged if b[3] >= tallest * 0.5]
+  return [(box, binary[box[1]:box[1] + box[3], box[0]:box[0] + box[2]]) for box in merged]
+
+def _vectors(crops):
+  """Stack crops as zero-mean, unit-length vectors so a dot product is a normalized correlation."""
+  vecs = np.stack([
+    cv2.resize(crop, GLYPH_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    for crop in crops
+  ])
+  vecs -= vecs.mean(axis=1, keepdims=True)
+  norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+  norms[norms == 0] = 1
+  return vecs / norms
+
+def _load_set(name):
+  labels, crops = [], []
+  folder = os.path.join(GLYPH_DIR, name)
+  if os.path.isdir(folder):
+    for file in sorted(os.listdir(folder)):
+      if not file.endswith(".png"):
+        continue
+      img = cv2.imread(os.path.join(folder, file), cv2.IMREAD_GRAYSCALE)
+      if img is None:
+        continue
+      stem = file.rsplit("_", 1)[0]
+      labels.append(_FILE_CHAR.get(stem, stem))
+      crops.append(img)
+  glyphs = (labels, _vectors(crops) if crops else None)
+  _sets[name] = glyphs
+  return glyphs
+
+def _glyphs(name):
+  glyphs = _sets.get(name)
+  return glyphs if glyphs is not None else _load_set(name)
+
+def _right_run(segments, max_gap_ratio=1.0):
+  """Trailing glyphs that sit next to each other, used when a label precedes the number."""
+  run = [segments[-1]]
+  for seg in reversed(segments[:-1]):
+    (x, _, w, h), _ = seg
+    nx = run[0][0][0]
+    if nx - (x + w) > max(h, run[0][0][3]) * max_gap_ratio:
+      break
+    run.insert(0, seg)
+  return run
+
+def read_number(img, glyph_set, suffix="", anchor_right=False, min_score=MIN_SCORE) -> int:
+  """
+  Read an integer from a fixed-font strip by matching each glyph against the learned templates.
+  suffix: characters expected after the digits (e.g. "%").
+  anchor_right: only read the rightmost run of glyphs, anything left of it is ignored.
+  Returns -1 when a glyph is unknown or not confident enough.
+  """
+  labels, matrix = _glyphs(glyph_set)
+  if matrix is None or img is None or img.size == 0:
+    return -1
+  # until every digit has a sample a missing one would be read as its closest look-alike
+  if not set(DIGITS + suffix) <= set(labels):
+    return -1
+
+  segments = segment(img, GLYPH_SETS.get(glyph_set, "dark"))
+  if not segments:
+    return -1
+  if anchor_right:
+    segments = _right_run(segments)
+
+  scores = _vectors([crop for _, crop in segments]) @ matrix.T
+  best = scores.argmax(axis=1)
+  if scores[np.arange(len(best)), best].min() < min_score:
+    return -1
+
+  text = "".join(labels[i] for i in best)
+  if suffix:
+    if not text.endswith(suffix):
+      return -1
+    text = text[:-len(suffix)]
+  if not text.isdigit():
+    return -1
+  return int(text)
+
+def _save_glyph(glyph_set, char, crop):
+  folder = os.path.join(GLYPH_DIR, glyph_set)
+  os.makedirs(folder, exist_ok=True)
+  stem = _CHAR_FILE.get(char, char)
+  count = sum(1 for f in os.listdir(folder) if f.rsplit("_", 1)[0] == stem)
+  if count >= MAX_SAMPLES:
+    return False
+  cv2.imwrite(os.path.join(folder, f"{stem}_{count}.png"), crop)
+  return True
+
+def set_learning(enabled=True):
+  global _learning
+  _learning = enabled
+
+def learn_number(img, glyph_set, value, suffix="", anchor_right=False) -> bool:
+  """
+  Vote for the glyphs of a strip whose value was read by the OCR fallback.
+  A glyph is saved as a template once AGREE_READS different strips showed that shape as the
+  same character and no read ever labeled it as another one, so one OCR misread never
+  becomes a template. Reads outside VALUE_RANGES or with a glyph count that doesn't match
+  the value are ignored. Returns True when the read was counted.
+  """
+  if not _learning or img is None or value is None or value < 0:
+    return False
+  low, high = VALUE_RANGES.get(glyph_set, (0, float("inf")))
+  if not low <= value <= high:
+    return False
+  text = f"{value}{suffix}"
+  segments = segment(img, GLYPH_SETS.get(glyph_set, "dark"))
+  if not segments:
+    return False
+  if anchor_right:
+    segments = _right_run(segments)
+  if len(segments) != len(text):
+    return False
+
+  crops = [crop for _, crop in segments]
+  vecs = _vectors(crops)
+  strip_id = hashlib.sha1(b"".join(crop.tobytes() for crop in crops)).hexdigest()
+  with _learn_lock:
+    labels, matrix = _glyphs(glyph_set)
+    if matrix is not None:
+      # a saved template of another character looks the same, the OCR read is wrong
+      scores = vecs @ matrix.T
+      for char, row in zip(text, scores):
+        if any(labels[j] != char for j in np.flatnonzero(row >= MIN_SCORE)):
+          debug(f"[GLYPH] {text} contradicts the {glyph_set} templates, not learned")
+          return False
+
+    pending = _pending.setdefault(glyph_set, [])
+    added = 0
+    for char, crop, vec in zip(text, crops, vecs):
+      entry = None
+      for candidate in pending:
+        if float(candidate["vector"] @ vec) < MIN_SCORE:
+          continue
+        if candidate["char"] != char:
+          # reads disagree on this shape, it is never learned
+          candidate["conflict"] = True
+        elif entry is None:
+          entry = candidate
+      if entry is None:
+        entry = {"char": char, "vector": vec, "crop": crop, "strips": set(), "conflict": False}
+        pending.append(entry)
+      entry["strips"].add(strip_id)
+
+      if not entry["conflict"] and len(entry["strips"]) >= AGREE_READS:
+        pending[:] = [c for c in pending if c is not entry]
+        added += _save_glyph(glyph_set, char, entry["crop"])
+    del pending[:-MAX_PENDING]
+
+    if added:
+      debug(f"[GLYPH] learned {added} glyph(s) for {glyph_set} from {text}")
+      _load_set(glyph_set)
+  return True
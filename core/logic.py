@@ -7,6 +7,8 @@ from utils.tools import sleep, get_secs, click
 
 import core.state as state
 import utils.constants as constants
+import core.race_calendar as race_calendar
+from core.scoring import score_trainings, best_of
 
 # Get priority stat from config
 def get_stat_priority(stat_key: str) -> int:
@@ -51,11 +53,13 @@ def most_support_card(results):
     info("No safe training found. All failure chances are too high.")
     return None
 
-  # this is the weight adder used for skewing results of training decisions PRIORITY_EFFECTS_LIST[get_stat_priority(x[0])] * PRIORITY_WEIGHTS_LIST[priority_weight]
-  # Best training
-  best_training = max(filtered_results.items(), key=training_score)
+  # Best training: supports + non-maxed supports + hint, skewed by the stat priority
+  scores = score_trainings(filtered_results, "most_support", year, current_stats=state.CURRENT_STATS)
+  for i, stat in enumerate(scores.stats):
+    debug(f"{stat} -> base={scores.base[i]}, multiplier={scores.multiplier[i]}, total={scores.score[i]}, priority={scores.priority[i]}")
 
-  best_key, best_data = best_training
+  best_key = best_of(scores)
+  best_data = filtered_results[best_key]
   
   RACE_IF_LOW = True
   FRIEND_IF_LOW = True
@@ -121,31 +125,6 @@ def most_support_card(results):
   info(f"Best training: {best_key.upper()} with {best_data['total_supports']} support cards, {best_data['total_non_maxed_support']} non-maxed support cards with {best_data['failure']}% fail chance and {best_data['total_hints']} total hint.")
   return best_key
 
-PRIORITY_WEIGHTS_LIST={
-  "HEAVY": 0.75,
-  "MEDIUM": 0.5,
-  "LIGHT": 0.25,
-  "NONE": 0
-}
-
-def training_score(x):
-  global PRIORITY_WEIGHTS_LIST
-  priority_weight = PRIORITY_WEIGHTS_LIST[state.PRIORITY_WEIGHT]
-  base = x[1]["total_supports"]
-  non_max_friends = x[1]["total_friendship_levels"]["gray"] + \
-                    x[1]["total_friendship_levels"]["blue"] + \
-                    x[1]["total_friendship_levels"]["green"]
-  base += non_max_friends * 1
-  if x[1]["total_hints"] > 0:
-      base += state.HINT_POINT
-  multiplier = 1 + state.PRIORITY_EFFECTS_LIST[get_stat_priority(x[0])] * priority_weight
-  total = base * multiplier
-
-  # Debug output
-  debug(f"{x[0]} -> base={base}, multiplier={multiplier}, total={total}, priority={get_stat_priority(x[0])}")
-
-  return (total, -get_stat_priority(x[0]))
-
 def filter_by_stat_caps(results, current_stats):
   return {
     stat: data for stat, data in results.items()
@@ -183,38 +162,24 @@ def decide_race_for_goal(year, turn, criteria, keywords):
 
                 if "G1" in criteria_text or "GI" in criteria_text:
                     info('Goal mentions "G1"; restricting to only G1 races.')
-                    filtered = [r for r in filtered if r.get("grade") == "G1"]
+                    allowed_grades = ("G1",)
+                elif turn <= 2:
+                    allowed_grades = ("G1", "G2", "G3", "OP")
                 else:
-                    # Get races for this year
-                    race_list = constants.RACE_LOOKUP.get(year, [])
-                    if not race_list:
-                        return False, None
-
-                    if turn <= 2:
-                        ALLOWED_GRADES = {"G1", "G2", "G3", "OP"}
-                    else:
-                        ALLOWED_GRADES = {"G1"}
-
-                filtered = [r for r in race_list if r.get("grade") in ALLOWED_GRADES]
-
-                if not filtered:
+                    allowed_grades = ("G1",)
+
+                # Get races for this turn, the lobby read already mapped it from the real criteria
+                # (Finale rounds depend on them, and callers may pass a stand-in criteria here)
+                virtual_turn = state.VIRTUAL_TURN
+                if virtual_turn is None or year != state.CURRENT_YEAR:
+                    virtual_turn = state.get_virtual_turn(year, criteria or "")
+                if not race_calendar.races_at(virtual_turn):
                     info("No races available for this turn.")
                     return False, None
 
-                current_fans = state.FAN_COUNT
-                
-                if current_fans != -1:
-                    filtered = [
-                        r for r in filtered
-                        if r.get("fans", {}).get("required", 0) <= current_fans
-                    ]
-                    if not filtered:
-                        info(f"No races meet fan requirement. Current fans = {current_fans}.")
-                        return False, None
-
-                best_race = filter_races_by_aptitude(filtered, state.APTITUDES)
+                best_race = race_calendar.best_race(virtual_turn, allowed_grades, state.APTITUDES, state.FAN_COUNT)
                 if not best_race:
-                    info("No matching race by aptitude.")
+                    info(f"No race matches grade, aptitude and fan requirement. Current fans = {state.FAN_COUNT}.")
                     return False, None
 
                 return True, best_race["name"]
@@ -224,28 +189,6 @@ def decide_race_for_goal(year, turn, criteria, keywords):
 
     return no_race
 
-def filter_races_by_aptitude(race_list, aptitudes):
-  GRADE_SCORE = {"s": 2, "a": 2, "b": 1}
-
-  results = []
-  for race in race_list:
-    surface_key = f"surface_{race['terrain'].lower()}"
-    distance_key = f"distance_{race['distance']['type'].lower()}"
-
-    s = GRADE_SCORE.get(aptitudes.get(surface_key, ""), 0)
-    d = GRADE_SCORE.get(aptitudes.get(distance_key, ""), 0)
-
-    if s and d:  # both nonzero (A or B)
-      score = s + d
-      results.append((score, race["fans"]["gained"], race))
-
-  if not results:
-    return None
-
-  # sort best → worst by score, then fans
-  results.sort(key=lambda x: (x[0], x[1]), reverse=True)
-  return results[0][2]
-
 def _get_next_scheduled_race():
     """Return the next scheduled race (dict) based on state.VIRTUAL_TURN."""
     schedule = state.RACE_SCHEDULE or []
@@ -270,25 +213,22 @@ def _get_next_scheduled_race():
 
 def _get_required_fans_for_scheduled_race(race_entry: dict) -> int:
     """
-    Look up the fan requirement of a scheduled race using constants.RACE_LOOKUP
-    and races.json data.
+    Look up the fan requirement of a scheduled race in the race calendar.
     """
     name = race_entry.get("name")
-    year = race_entry.get("year")
-    date = race_entry.get("date")
+    turn = race_entry.get("turnNumber")
 
-    if not (name and year and date):
-        return 0
-
-    # RACE_LOOKUP is keyed by "Classic Year Early May", etc.
-    lookup_key = f"{year} {date}"
-    race_list = constants.RACE_LOOKUP.get(lookup_key, [])
+    if not isinstance(turn, int):
+        year = race_entry.get("year")
+        date = race_entry.get("date")
+        if not (year and date):
+            return 0
+        turn = state.get_virtual_turn(f"{year} {date}", "")
 
-    for r in race_list:
-        if r.get("name") == name:
-            return r.get("fans", {}).get("required", 0)
+    if not name:
+        return 0
 
-    return 0
+    return race_calendar.required_fans(name, turn)
 
 def check_fans_for_upcoming_schedule() -> bool:
     next_race = _get_next_scheduled_race()
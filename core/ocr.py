@@ -1,34 +1,203 @@
-import easyocr
 from PIL import Image
 import numpy as np
+import os
 import re
+import threading
 from typing import List, Tuple
-from utils.screenshot import enhance_image_for_ocr_2, enhance_image_for_ocr
+from utils.log import info, warning, error, debug
+from utils.metrics import timed
+from utils.screenshot import enhance_image_for_ocr_2, enhance_image_for_ocr, enhanced_screenshot
 
-reader = easyocr.Reader(["en"], gpu=True)
+DIGITS = "0123456789"
+
+# OCR settings, set from config.json by configure_ocr()
+OCR_BACKEND = "easyocr"
+OCR_USE_GPU = True
+ONNX_MODEL_PATH = "models/easyocr_recognizer.onnx"
+
+_reader = None
+_reader_lock = threading.Lock()
+# the torch model isn't safe to run from several threads at once
+_infer_lock = threading.Lock()
+
+def configure_ocr(settings: dict):
+  """Apply the "ocr" config section. The reader is rebuilt on next use if anything changed."""
+  global OCR_BACKEND, OCR_USE_GPU, ONNX_MODEL_PATH, _reader
+  backend = settings.get("backend", OCR_BACKEND)
+  use_gpu = settings.get("use_gpu", OCR_USE_GPU)
+  onnx_model_path = settings.get("onnx_model_path", ONNX_MODEL_PATH)
+
+  with _reader_lock:
+    if (backend, use_gpu, onnx_model_path) != (OCR_BACKEND, OCR_USE_GPU, ONNX_MODEL_PATH):
+      _reader = None
+    OCR_BACKEND, OCR_USE_GPU, ONNX_MODEL_PATH = backend, use_gpu, onnx_model_path
+
+def get_reader():
+  """EasyOCR reader, created on first use so importing this module stays cheap."""
+  global _reader
+  if _reader is None:
+    with _reader_lock:
+      if _reader is None:
+        _reader = _build_reader()
+  return _reader
+
+def _build_reader():
+  # torch and easyocr take seconds to import, only pay for it when OCR is needed
+  import easyocr
+
+  if OCR_BACKEND == "onnx":
+    session = _load_onnx_session(ONNX_MODEL_PATH)
+    if session is not None:
+      info(f"OCR backend: ONNX Runtime ({ONNX_MODEL_PATH})")
+      ocr_reader = easyocr.Reader(["en"], gpu=False, quantize=False, verbose=False)
+      ocr_reader.recognizer = OnnxRecognizer(session)
+      return ocr_reader
+    warning("ONNX OCR backend unavailable, falling back to EasyOCR on CPU.")
+    return easyocr.Reader(["en"], gpu=False, quantize=True, verbose=False)
+
+  # quantize only applies on CPU, it's a no-op when a GPU is used
+  info(f"OCR backend: EasyOCR ({'GPU' if OCR_USE_GPU else 'CPU'})")
+  return easyocr.Reader(["en"], gpu=OCR_USE_GPU, quantize=True, verbose=False)
+
+def _load_onnx_session(path: str):
+  if not os.path.isfile(path):
+    warning(f"ONNX recognizer not found: {path}. Export it with core.ocr.export_onnx_recognizer().")
+    return None
+  try:
+    import onnxruntime
+  except ImportError:
+    warning("onnxruntime is not installed.")
+    return None
+  return onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+
+class OnnxRecognizer:
+  """
+  Drop-in for EasyOCR's torch recognizer: EasyOCR keeps doing the cropping,
+  resizing and CTC decoding, only the network forward pass runs in ONNX Runtime.
+  """
+
+  def __init__(self, session):
+    self.session = session
+    self.input_name = session.get_inputs()[0].name
+
+  def eval(self):
+    return self
+
+  def __call__(self, image, text=None):
+    import torch
+    preds = self.session.run(None, {self.input_name: image.cpu().numpy()})[0]
+    return torch.from_numpy(preds)
+
+def export_onnx_recognizer(path: str = None):
+  """Export EasyOCR's English recognizer to ONNX for the "onnx" backend."""
+  import easyocr
+  import torch
+
+  path = path or ONNX_MODEL_PATH
+  os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+  ocr_reader = easyocr.Reader(["en"], gpu=False, quantize=False, verbose=False)
+  model = ocr_reader.recognizer
+  model.eval()
+  # EasyOCR feeds grayscale crops resized to a height of 64
+  dummy_image = torch.randn(1, 1, 64, 256)
+  dummy_text = torch.zeros(1, 1, dtype=torch.long)
+  torch.onnx.export(
+    model,
+    (dummy_image, dummy_text),
+    path,
+    input_names=["image"],
+    output_names=["preds"],
+    dynamic_axes={"image": {0: "batch", 3: "width"}, "preds": {0: "batch", 1: "steps"}},
+    opset_version=12,
+  )
+  info(f"Exported OCR recognizer to {path}")
+  return path
+
+@timed("ocr.readtext")
+def _readtext(img_np, **kwargs):
+  ocr_reader = get_reader()
+  with _infer_lock:
+    return ocr_reader.readtext(img_np, **kwargs)
+
+@timed("ocr.recognize")
+def _recognize(img_np, **kwargs):
+  ocr_reader = get_reader()
+  with _infer_lock:
+    return ocr_reader.recognize(img_np, **kwargs)
 
 def extract_text(pil_img: Image.Image) -> str:
   img_np = np.array(pil_img)
-  result = reader.readtext(img_np)
+  result = _readtext(img_np)
   texts = [text[1] for text in result]
   return " ".join(texts)
 
 def extract_number(pil_img: Image.Image) -> int:
   img_np = np.array(pil_img)
-  result = reader.readtext(img_np, allowlist="0123456789")
+  result = _readtext(img_np, allowlist=DIGITS)
   texts = [text[1] for text in result]
-  joined_text = "".join(texts)
+  return parse_number("".join(texts))
 
-  digits = re.sub(r"[^\d]", "", joined_text)
+def parse_number(text: str) -> int:
+  digits = re.sub(r"[^\d]", "", text or "")
 
   if digits:
     return int(digits)
-  
+
   return -1
 
+def read_regions(fields, frame=None) -> dict:
+  """
+  Read many single-line fields at once.
+  fields: list of (name, region, allowlist), region is (left, top, width, height).
+
+  The boxes are already known, so the text detector is skipped for every field, which is
+  where the time goes on CPU. Regions are preprocessed like enhanced_screenshot, stacked
+  into one canvas and sent to the recognizer in one call per allowlist. On GPU that call
+  runs the crops as one batch; EasyOCR's CPU path (and the ONNX backend) still recognizes
+  them one at a time, so there the single call only saves the per-call overhead.
+  Returns {name: text}.
+  """
+  groups = {}
+  for name, region, allowlist in fields:
+    img = np.array(enhanced_screenshot(region, frame))
+    groups.setdefault(allowlist, []).append((name, img))
+
+  texts = {}
+  for allowlist, tiles in groups.items():
+    width = max(img.shape[1] for _, img in tiles)
+    height = sum(img.shape[0] for _, img in tiles)
+    canvas = np.zeros((height, width), dtype=np.uint8)
+
+    boxes = []
+    name_by_top = {}
+    y = 0
+    for name, img in tiles:
+      h, w = img.shape[:2]
+      canvas[y:y + h, :w] = img
+      boxes.append([0, w, y, y + h])  # x_min, x_max, y_min, y_max
+      name_by_top[y] = name
+      texts[name] = ""
+      y += h
+
+    result = _recognize(
+      canvas,
+      horizontal_list=boxes,
+      free_list=[],
+      allowlist=allowlist,
+      batch_size=len(boxes),
+    )
+    # results come back sorted by position, map them back by the tile's top edge
+    for box, text, _conf in result:
+      name = name_by_top.get(int(box[0][1]))
+      if name is not None:
+        texts[name] = " ".join(text.split())
+
+  return texts
+
 def extract_percent(pil_img: Image.Image) -> int:
   # read only digits and % to cut noise
-  result = reader.readtext(np.array(pil_img), allowlist="0123456789%")  # keeps '%', drops letters:contentReference[oaicite:0]{index=0}
+  result = _readtext(np.array(pil_img), allowlist="0123456789%")  # keeps '%', drops letters:contentReference[oaicite:0]{index=0}
   s = " ".join(t[1] for t in result)
 
   s = s.replace("O", "0").replace("o", "0").replace("l", "1")
@@ -53,11 +222,11 @@ def extract_percent(pil_img: Image.Image) -> int:
 
 def get_text_results(processed_img):
   img_np = np.array(processed_img)
-  results = reader.readtext(img_np)
+  results = _readtext(img_np)
   # Fallback to recognize if readtext returns nothing
   if not results:
     try:
-      raw_results = reader.recognize(img_np)
+      raw_results = _recognize(img_np)
       # Normalize to (bbox, text, confidence)
       return [(r[0], r[1], float(r[2])) for r in raw_results]
     except AttributeError:
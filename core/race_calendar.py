@@ -0,0 +1,101 @@
+import numpy as np
+
+import utils.constants as constants
+
+# races.json compiled once into flat arrays sorted by virtual turn (see state.get_virtual_turn).
+# The races of turn t are RACES[SLOT_START[t]:SLOT_START[t + 1]], their attributes are
+# bucketed into small ints so picking a race is a few array ops on that slice.
+TURNS = 76
+GRADES = ("G1", "G2", "G3", "OP", "Pre-OP")
+SURFACES = ("turf", "dirt")
+# race distance type -> aptitude name, races.json says "Short" where the aptitudes say "sprint"
+DISTANCES = ("sprint", "mile", "medium", "long")
+_DISTANCE_ALIASES = {"short": "sprint"}
+# aptitude letter -> score, a race needs both surface and distance above 0
+APTITUDE_SCORE = {"s": 2, "a": 2, "b": 1}
+
+def _index(values, value):
+  return values.index(value) if value in values else -1
+
+def distance_name(race):
+  kind = race["distance"]["type"].lower()
+  return _DISTANCE_ALIASES.get(kind, kind)
+
+def _grade_bits(grades):
+  return sum(1 << GRADES.index(g) for g in set(grades) if g in GRADES)
+
+def build_calendar(races_by_year):
+  """Races from races.json data ({year: {name: race}}) that have a turn, sorted by turn."""
+  races = []
+  for year, year_races in races_by_year.items():
+    for name, data in year_races.items():
+      turn = data.get("turnNumber")
+      if isinstance(turn, int) and 0 <= turn < TURNS:
+        races.append({"name": name, "year": year, **data})
+  # stable, so races of one turn keep their races.json order
+  races.sort(key=lambda r: r["turnNumber"])
+  return races
+
+RACES = build_calendar(constants.RACES)
+TURN = np.array([r["turnNumber"] for r in RACES], dtype=np.int16)
+SLOT_START = np.searchsorted(TURN, np.arange(TURNS + 1))
+# one bit per grade so a set of grades is a single AND
+GRADE_BIT = np.array([1 << GRADES.index(r["grade"]) if r.get("grade") in GRADES else 0 for r in RACES], dtype=np.int32)
+SURFACE = np.array([_index(SURFACES, r["terrain"].lower()) for r in RACES], dtype=np.int8)
+DISTANCE = np.array([_index(DISTANCES, distance_name(r)) for r in RACES], dtype=np.int8)
+FANS_REQUIRED = np.array([r.get("fans", {}).get("required", 0) for r in RACES], dtype=np.int32)
+FANS_GAINED = np.array([r.get("fans", {}).get("gained", 0) for r in RACES], dtype=np.int64)
+# (name, turn) -> race, names repeat between the Classic and Senior years
+RACE_BY_NAME = {(r["name"], r["turnNumber"]): r for r in RACES}
+
+# aptitude letters -> rank of every race, aptitudes only change a few times per career
+_ranks_cache = {}
+
+def _slot(turn):
+  if not isinstance(turn, int) or not 0 <= turn < TURNS:
+    return slice(0, 0)
+  return slice(SLOT_START[turn], SLOT_START[turn + 1])
+
+def races_at(turn):
+  return RACES[_slot(turn)]
+
+def required_fans(name, turn):
+  race = RACE_BY_NAME.get((name, turn))
+  return race.get("fans", {}).get("required", 0) if race else 0
+
+def _ranks(aptitudes):
+  """Rank of every race for these aptitudes, -1 where the race can't be entered."""
+  letters = tuple(aptitudes.get(f"surface_{name}", "") for name in SURFACES)
+  letters += tuple(aptitudes.get(f"distance_{name}", "") for name in DISTANCES)
+  cached = _ranks_cache.get(letters)
+  if cached is None:
+    table = np.array([APTITUDE_SCORE.get(a, 0) for a in letters], dtype=np.int64)
+    # index -1 (unknown surface/distance) lands on a trailing 0
+    surface = np.append(table[:len(SURFACES)], 0)[SURFACE]
+    distance = np.append(table[len(SURFACES):], 0)[DISTANCE]
+    scores = np.where((surface > 0) & (distance > 0), surface + distance, 0)
+    # highest score first, then most fans gained, packed into one key for argmax
+    ranks = np.where(scores > 0, (scores << 32) + FANS_GAINED, -1)
+    cached = _ranks_cache[letters] = ranks
+  return cached
+
+def best_race(turn, grades, aptitudes, max_fans_required=-1):
+  """
+  Best race on turn among grades the trainee can enter: highest aptitude score, then most fans gained.
+  max_fans_required: current fan count, -1 when unknown skips the fan check.
+  Returns the race dict or None.
+  """
+  slot = _slot(turn)
+  if slot.start == slot.stop:
+    return None
+
+  rank = _ranks(aptitudes)[slot]
+  mask = (GRADE_BIT[slot] & _grade_bits(grades)) != 0
+  if max_fans_required != -1:
+    mask &= FANS_REQUIRED[slot] <= max_fans_required
+  rank = np.where(mask, rank, -1)
+  # argmax takes the first of equal ranks, ties keep races.json order like the old stable sort
+  best = int(rank.argmax())
+  if rank[best] < 0:
+    return None
+  return RACES[slot.start + best]
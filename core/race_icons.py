@@ -0,0 +1,139 @@
+import os
+from collections import namedtuple
+import cv2
+import numpy as np
+
+from utils.log import info, warning, error, debug
+from utils.screenshot import crop_frame
+from utils.metrics import timed
+
+# Race banners in the race list are told apart by comparing small thumbnails against every
+# icon in ICON_DIR at once. Only used to steer the scrolling, the race to click is still
+# confirmed by template matching its own icon.
+ICON_DIR = "assets/races_icon"
+DESCRIPTOR_SIZE = (48, 24)  # (width, height)
+MIN_SIMILARITY = 0.85
+
+# banners are the saturated blobs of the list, the background and text are grey
+BANNER_SATURATION = 60
+BANNER_MIN_SIZE = (100, 50)  # (width, height)
+BANNER_MAX_SIZE = (200, 110)
+# distance between two list rows when fewer than two banners are visible
+DEFAULT_ROW_PITCH = 135
+
+Banner = namedtuple("Banner", "name score box")
+
+# (icon names, matrix of their descriptors), built on first use
+_index = None
+
+def descriptors(imgs):
+  """
+  Zero-mean, unit-length thumbnails of the white banner text, a dot product between two is their correlation.
+  Banners of one grade share their background, the race name is what tells them apart.
+  """
+  vecs = []
+  for img in imgs:
+    hsv = cv2.cvtColor(cv2.resize(img, DESCRIPTOR_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2HSV).astype(np.float32)
+    text = (255 - hsv[:, :, 1]) * (hsv[:, :, 2] / 255)
+    vecs.append(cv2.GaussianBlur(text, (3, 3), 0).ravel())
+  vecs = np.stack(vecs)
+  vecs -= vecs.mean(axis=1, keepdims=True)
+  norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+  norms[norms == 0] = 1
+  return vecs / norms
+
+def _icon_index():
+  global _index
+  if _index is None:
+    names, imgs = [], []
+    if os.path.isdir(ICON_DIR):
+      for file in sorted(os.listdir(ICON_DIR)):
+        if not file.endswith(".png"):
+          continue
+        img = cv2.imread(os.path.join(ICON_DIR, file), cv2.IMREAD_COLOR)
+        if img is None:
+          continue
+        names.append(file[:-len(".png")])
+        imgs.append(img)
+    _index = (names, descriptors(imgs) if imgs else None)
+    debug(f"[RACE] indexed {len(names)} race icons")
+  return _index
+
+def identify(imgs, candidates=None):
+  """
+  (name, similarity) of the closest race icon for every image, name is None below MIN_SIMILARITY.
+  candidates: only consider these race names (e.g. the races of the current turn).
+  """
+  names, matrix = _icon_index()
+  if matrix is None or not imgs:
+    return [(None, 0.0) for _ in imgs]
+  columns = np.arange(len(names))
+  if candidates:
+    wanted = set(candidates)
+    columns = np.array([i for i, name in enumerate(names) if name in wanted], dtype=np.intp)
+    if columns.size == 0:
+      return [(None, 0.0) for _ in imgs]
+  scores = descriptors(imgs) @ matrix[columns].T
+  best = scores.argmax(axis=1)
+  result = []
+  for i, j in enumerate(best):
+    score = float(scores[i, j])
+    result.append((names[columns[j]] if score >= MIN_SIMILARITY else None, score))
+  return result
+
+def _banner_boxes(roi):
+  hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+  mask = (hsv[:, :, 1] > BANNER_SATURATION).astype(np.uint8)
+  # close the gaps left by white text on the banners
+  mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((7, 7), np.uint8))
+  n, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+  boxes = []
+  for x, y, w, h, _ in stats[1:n]:
+    if BANNER_MIN_SIZE[0] <= w <= BANNER_MAX_SIZE[0] and BANNER_MIN_SIZE[1] <= h <= BANNER_MAX_SIZE[1]:
+      boxes.append((int(x), int(y), int(w), int(h)))
+  return sorted(boxes, key=lambda b: b[1])
+
+@timed("recognizer.race_banners")
+def find_banners(region, frame=None, candidates=None):
+  """
+  Banners visible in region (left, top, width, height), top to bottom, boxes in screen coordinates.
+  candidates: race names the list can hold, see identify.
+  """
+  roi = crop_frame(region, frame)
+  boxes = _banner_boxes(roi)
+  found = identify([roi[y:y + h, x:x + w] for x, y, w, h in boxes], candidates)
+  left, top = max(int(region[0]), 0), max(int(region[1]), 0)
+  return [
+    Banner(name, score, (x + left, y + top, w, h))
+    for (name, score), (x, y, w, h) in zip(found, boxes)
+  ]
+
+def row_pitch(banners):
+  tops = [b.box[1] for b in banners]
+  gaps = [b - a for a, b in zip(tops, tops[1:]) if b - a >= BANNER_MIN_SIZE[1]]
+  return int(np.median(gaps)) if gaps else DEFAULT_ROW_PITCH
+
+def scroll_distance(banners, target, order=None, region=None):
+  """
+  Pixels the list content has to move up (negative: down) to bring target into region.
+  order: race names in list order, when known the distance is computed from a visible banner,
+  otherwise it is a page of the visible rows.
+  Returns 0 when target is already visible.
+  """
+  if any(b.name == target for b in banners):
+    return 0
+  pitch = row_pitch(banners)
+
+  if order and target in order:
+    known = [(order.index(b.name), b) for b in banners if b.name in order]
+    if known:
+      index, banner = known[0]
+      target_top = banner.box[1] + (order.index(target) - index) * pitch
+      # aim for the first row of the region
+      region_top = region[1] if region else banner.box[1]
+      return target_top - region_top
+
+  if not banners:
+    return region[3] if region else 2 * pitch
+  # one page: the last visible row ends up at the top
+  return pitch * max(len(banners) - 1, 1)
@@ -1,67 +1,184 @@
+import time
 import cv2
 import numpy as np
-from PIL import ImageGrab, ImageStat
+from collections import namedtuple
+from PIL import ImageStat
 
 from utils.log import info, warning, error, debug
-from utils.screenshot import capture_region
+from utils.screenshot import capture_region, crop_frame, crop_bbox, current_frame, grab_frame
+from core.templates import get_color, get_template
+from utils.metrics import timed
 
-def match_template(template_path, region=None, threshold=0.85):
+@timed("recognizer.match_template")
+def match_template(template_path, region=None, threshold=0.85, frame=None, with_scores=False):
   # Get screenshot
   if region:
-    screen = np.array(ImageGrab.grab(bbox=region))  # (left, top, right, bottom)
+    screen = crop_bbox(region, frame)  # (left, top, right, bottom)
   else:
-    screen = np.array(ImageGrab.grab())
-  screen = cv2.cvtColor(screen, cv2.COLOR_RGB2BGR)
+    screen = _screen(frame)
 
 #  cv2.namedWindow("image")
 #  cv2.moveWindow("image", -900, 0)
 #  cv2.imshow("image", screen)
 #  cv2.waitKey(5)
 
-  # Load template
-  template = cv2.imread(template_path, cv2.IMREAD_COLOR)  # safe default
-  if template.shape[2] == 4:
-    template = cv2.cvtColor(template, cv2.COLOR_BGRA2BGR)
+  # Cached template, decoded once
+  template = get_color(template_path)
+  if template is None:
+    return []
   result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
-  loc = np.where(result >= threshold)
+  return find_peaks(result, template.shape, threshold, with_scores=with_scores)
 
-  h, w = template.shape[:2]
-  boxes = [(x, y, w, h) for (x, y) in zip(*loc[::-1])]
-
-  return deduplicate_boxes(boxes)
+def _screen(frame=None):
+  # full BGR screen, the shared frame if one is held
+  if frame is not None:
+    return frame
+  frame = current_frame()
+  return frame if frame is not None else grab_frame()
 
-def multi_match_templates(templates, screen=None, threshold=0.85):
-  if screen is None:
-    screen = ImageGrab.grab()
-  screen_bgr = cv2.cvtColor(np.array(screen), cv2.COLOR_RGB2BGR)
+@timed("recognizer.multi_match_templates")
+def multi_match_templates(templates, screen=None, threshold=0.85, with_scores=False):
+  """screen: BGR array, the shared frame (or a fresh grab) if None."""
+  screen_bgr = _screen(screen)
 
   results = {}
   for name, path in templates.items():
-    template = cv2.imread(path, cv2.IMREAD_COLOR)
+    template = get_color(path)
     if template is None:
       results[name] = []
       continue
-    if template.shape[2] == 4:
-      template = cv2.cvtColor(template, cv2.COLOR_BGRA2BGR)
 
     result = cv2.matchTemplate(screen_bgr, template, cv2.TM_CCOEFF_NORMED)
-    loc = np.where(result >= threshold)
+    results[name] = find_peaks(result, template.shape, threshold, with_scores=with_scores)
+  return results
+
+@timed("recognizer.multi_match_shared")
+def multi_match_shared(templates, screen=None, threshold=0.85, with_scores=False):
+  """
+  multi_match_templates for many small templates on one image. The image is transformed once,
+  every template is correlated against those shared spectra, and the window sums that
+  normalize the scores are shared by templates of the same size. Scores are TM_CCOEFF_NORMED
+  in color like matchTemplate's, up to float rounding.
+  """
+  screen_bgr = _screen(screen)
+  height, width = screen_bgr.shape[:2]
+  results = {name: [] for name in templates}
+  loaded = {}
+  for name, path in templates.items():
+    template = get_template(path)
+    if template is not None and template.shape[0] <= height and template.shape[1] <= width:
+      loaded[name] = template
+  if not loaded:
+    return results
+
+  # only the valid part of the correlation is kept, it never wraps around at the image size
+  size = (cv2.getOptimalDFTSize(height), cv2.getOptimalDFTSize(width))
+  image = screen_bgr.astype(np.float32)
+  spectra = []
+  for c in range(3):
+    padded = np.zeros(size, np.float32)
+    padded[:height, :width] = image[:, :, c]
+    spectra.append(cv2.dft(padded, nonzeroRows=height))
+  pixels = screen_bgr.astype(np.float64)
+  squares = np.square(pixels).sum(axis=2)
+  # (h, w) -> summed per-channel variance of every window, times the window area
+  variances = {}
+
+  for name, template in loaded.items():
     h, w = template.shape[:2]
-    boxes = [(x, y, w, h) for (x, y) in zip(*loc[::-1])]
-    results[name] = boxes
+    rows, cols = height - h + 1, width - w + 1
+    template_spectra, energy = template.spectrum(size)
+    product = cv2.mulSpectrums(spectra[0], template_spectra[0], 0, conjB=True)
+    for c in (1, 2):
+      product += cv2.mulSpectrums(spectra[c], template_spectra[c], 0, conjB=True)
+    correlation = cv2.idft(product, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT)[:rows, :cols]
+
+    variance = variances.get((h, w))
+    if variance is None:
+      sums = cv2.boxFilter(pixels, -1, (w, h), anchor=(0, 0), normalize=False, borderType=cv2.BORDER_CONSTANT)[:rows, :cols]
+      square_sums = cv2.boxFilter(squares, -1, (w, h), anchor=(0, 0), normalize=False, borderType=cv2.BORDER_CONSTANT)[:rows, :cols]
+      variance = np.maximum(square_sums - np.square(sums).sum(axis=2) / (h * w), 0)
+      variances[(h, w)] = variance
+
+    denominator = np.sqrt(variance * energy)
+    # flat windows can't correlate with anything
+    result = np.divide(correlation, denominator, out=np.zeros(denominator.shape), where=denominator > 1e-6)
+    results[name] = find_peaks(result.astype(np.float32), template.shape, threshold, with_scores=with_scores)
   return results
 
-def deduplicate_boxes(boxes, min_dist=5):
-  filtered = []
-  for x, y, w, h in boxes:
-    cx, cy = x + w // 2, y + h // 2
-    if all(abs(cx - (fx + fw // 2)) > min_dist or abs(cy - (fy + fh // 2)) > min_dist
-        for fx, fy, fw, fh in filtered):
-      filtered.append((x, y, w, h))
-  return filtered
-
-def is_btn_active(region, treshold = 150):
-  screenshot = capture_region(region)
+def find_peaks(result, template_shape, threshold=0.85, min_dist=5, with_scores=False):
+  """
+  Boxes (x, y, w, h) at the local maxima of a matchTemplate map, top to bottom.
+  Peaks closer than min_dist on both axes are suppressed in favour of the higher score.
+  with_scores: return (box, score) pairs instead of bare boxes.
+  """
+  h, w = template_shape[:2]
+  # a point is a peak if it's the max of its (2*min_dist+1) neighbourhood
+  kernel = np.ones((2 * min_dist + 1, 2 * min_dist + 1), np.uint8)
+  peaks = (result >= threshold) & (result >= cv2.dilate(result, kernel))
+  ys, xs = np.nonzero(peaks)
+  if len(xs) == 0:
+    return []
+
+  # plateaus leave several equal peaks next to each other, keep the best-scored one
+  scores = result[ys, xs]
+  order = np.argsort(-scores, kind="stable")
+  keep = np.ones(len(order), bool)
+  for i, idx in enumerate(order):
+    if not keep[i]:
+      continue
+    rest = order[i + 1:]
+    close = (np.abs(xs[rest] - xs[idx]) <= min_dist) & (np.abs(ys[rest] - ys[idx]) <= min_dist)
+    keep[i + 1:] &= ~close
+
+  kept = np.sort(order[keep])  # back to row-major order, same as np.where
+  if with_scores:
+    return [((int(xs[i]), int(ys[i]), w, h), float(scores[i])) for i in kept]
+  return [(int(xs[i]), int(ys[i]), w, h) for i in kept]
+
+# same fields as pyautogui's Box/Point so results can be passed straight to moveTo/click
+Box = namedtuple("Box", "left top width height")
+Point = namedtuple("Point", "x y")
+
+def _best_match(screen, template, left=0, top=0):
+  h, w = template.shape[:2]
+  if screen.shape[0] < h or screen.shape[1] < w:
+    return None, -1
+  result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+  _, score, _, (x, y) = cv2.minMaxLoc(result)
+  return Box(left + x, top + y, w, h), score
+
+@timed("recognizer.locate")
+def locate(img, region=None, confidence=0.8, min_search=0, frame=None):
+  """
+  Best match of img as a Box in screen coordinates, None if not found.
+  region: (left, top, width, height) like pyautogui.
+  min_search: keep retrying for this many seconds, retries always capture the live screen.
+  """
+  template = get_color(img)
+  if template is None:
+    return None
+
+  left, top = (max(int(region[0]), 0), max(int(region[1]), 0)) if region else (0, 0)
+  screen = crop_frame(region, frame) if region else _screen(frame)
+  deadline = time.time() + min_search
+  while True:
+    box, score = _best_match(screen, template, left, top)
+    if score >= confidence:
+      return box
+    if time.time() >= deadline:
+      return None
+    time.sleep(0.05)
+    screen = grab_frame(region)
+
+def locate_center(img, region=None, confidence=0.8, min_search=0, frame=None):
+  box = locate(img, region, confidence, min_search, frame)
+  if box is None:
+    return None
+  return Point(box.left + box.width // 2, box.top + box.height // 2)
+
+def is_btn_active(region, treshold = 150, frame=None):
+  screenshot = capture_region(region, frame)
   grayscale = screenshot.convert("L")
   stat = ImageStat.Stat(grayscale)
   avg_brightness = stat.mean[0]
@@ -70,29 +187,31 @@ def is_btn_active(region, treshold = 150):
   # Treshold btn
   return avg_brightness > treshold
 
-def count_pixels_of_color(color_rgb=[117,117,117], region=None, tolerance=2):
+def count_pixels_of_color(color_rgb=[117,117,117], region=None, tolerance=2, frame=None):
     # [117,117,117] is gray for missing energy, we go 2 below and 2 above so that it's more stable in recognition
     if region:
-        screen = np.array(ImageGrab.grab(bbox=region))  # (left, top, right, bottom)
+        screen = crop_bbox(region, frame)  # (left, top, right, bottom)
     else:
         return -1
 
-    color = np.array(color_rgb, np.uint8)
+    # screen is BGR
+    color = np.array(color_rgb[::-1], np.int16)
 
     # define min/max range ±2
-    color_min = np.clip(color - tolerance, 0, 255)
-    color_max = np.clip(color + tolerance, 0, 255)
+    color_min = np.clip(color - tolerance, 0, 255).astype(np.uint8)
+    color_max = np.clip(color + tolerance, 0, 255).astype(np.uint8)
 
     dst = cv2.inRange(screen, color_min, color_max)
     pixel_count = cv2.countNonZero(dst)
     return pixel_count
 
-def find_color_of_pixel(region=None):
+def find_color_of_pixel(region=None, frame=None):
   if region:
     #we can only return one pixel's color here, so we take the x, y and add 1 to them
     region = (region[0], region[1], region[0]+1, region[1]+1)
-    screen = np.array(ImageGrab.grab(bbox=region))  # (left, top, right, bottom)
-    return screen[0]
+    screen = crop_bbox(region, frame)  # (left, top, right, bottom)
+    # BGR -> RGB
+    return screen[0, 0, ::-1]
   else:
     return -1
 
@@ -0,0 +1,176 @@
+from collections import namedtuple
+import numpy as np
+
+import core.state as state
+
+# Training scores for every scenario from one feature matrix: one row per training,
+# columns are FEATURES. A scenario is a set of weights over the same matrix, so the
+# decision is a few array ops and can be replayed offline from the recorded results.
+STATS = ("spd", "sta", "pwr", "guts", "wit")
+FEATURES = (
+  "supports",          # total support cards
+  "gray", "blue", "green",  # support cards by friendship level, all cards
+  "friend_green",      # green friendship level on the friend card
+  "rainbow",           # yellow/max friendship level cards of the training's own type
+  "non_maxed_speed",   # non-maxed speed cards
+  "hint",              # 1 when any card has a hint
+  "white_flame",
+  "blue_flame",
+  "wit",               # 1 on the wit training
+  "failure",
+  "headroom",          # stat cap minus current stat
+)
+_COL = {name: i for i, name in enumerate(FEATURES)}
+
+# columns of contributions, summed in this order into the base score
+CONTRIBUTIONS = ("supports", "non_maxed", "rainbow", "non_maxed_speed", "hint", "white_flame", "blue_flame", "wit")
+
+PRIORITY_WEIGHTS = {
+  "HEAVY": 0.75,
+  "MEDIUM": 0.5,
+  "LIGHT": 0.25,
+  "NONE": 0
+}
+
+Scores = namedtuple("Scores", "stats score base point multiplier contributions priority ranked")
+
+def _levels(data, key):
+  return data.get(key, {}).get("friendship_levels", {})
+
+def _headroom(cap, value):
+  return cap - value if isinstance(value, (int, float)) and value >= 0 else np.nan
+
+def feature_matrix(results, current_stats=None):
+  """
+  (stat names, float matrix with one row of FEATURES per training) from check_training results.
+  current_stats: the trainee's stats, headroom is NaN for a stat that isn't known or wasn't read.
+  """
+  stats = tuple(results)
+  caps = state.STAT_CAPS or {}
+  current_stats = current_stats or {}
+  matrix = np.zeros((len(stats), len(FEATURES)))
+  for i, stat in enumerate(stats):
+    data = results[stat]
+    levels = data["total_friendship_levels"]
+    own = _levels(data, stat)
+    speed = _levels(data, "spd")
+    matrix[i] = (
+      data["total_supports"],
+      levels["gray"], levels["blue"], levels["green"],
+      _levels(data, "friend").get("green", 0),
+      own.get("yellow", 0) + own.get("max", 0),
+      speed.get("gray", 0) + speed.get("blue", 0) + speed.get("green", 0),
+      1 if data["total_hints"] > 0 else 0,
+      data.get("total_white_flame", 0),
+      data.get("total_blue_flame", 0),
+      1 if stat == "wit" else 0,
+      int(data["failure"]),
+      _headroom(caps.get(stat, 1200), current_stats.get(stat)),
+    )
+  return stats, matrix
+
+def scenario_weights(scenario, year, summer=False):
+  """
+  Weights of one scoring mode for the current year:
+  "ura" and "unity" are the scenario training scores, "most_support" the first-year fallback.
+  """
+  year_name = year.split(" ")[0]
+  weights = {
+    "supports": 0.0,
+    "levels": (1.0, 1.0, 1.0, 0.0),  # gray, blue, green, minus friend green
+    "boost": 0.0,                    # extra share once a count passes its threshold
+    "rainbow": 0.0,
+    "non_maxed_speed": 0.0,
+    "hint": state.HINT_POINT,
+    "white_flame": 0.0,
+    "blue_flame": 0.0,
+    "blue_flame_stats": (),
+    "wit": 0.0,
+    # priority multiplier: None, "priority" or "summer"
+    "multiplier": "priority",
+  }
+
+  if scenario == "most_support":
+    weights["supports"] = 1.0
+    return weights
+
+  weights["multiplier"] = "summer" if summer else (None if year_name == "Junior" else "priority")
+  if scenario == "ura":
+    weights.update(boost=0.5, rainbow=1.5)
+  elif scenario == "unity":
+    weights.update(
+      levels=(1.02, 1.01, 1.0, 1.0),
+      boost=0.25,
+      rainbow=0.75 if year_name == "Junior" else 1.5,
+      non_maxed_speed=0.25,
+      white_flame=0.25 if year_name == "Finale" else 0.5,
+      blue_flame=2.0,
+      blue_flame_stats=tuple(state.UNITY_SPIRIT_BURST_POSITION or ()),
+      wit=0.5,
+    )
+    if summer:
+      weights.update(rainbow=2.0, white_flame=0.25)
+  else:
+    raise ValueError(f"Unknown scoring mode: {scenario}")
+  return weights
+
+def score_matrix(stats, matrix, weights):
+  """
+  Score every row of a feature matrix at once.
+  Returns Scores: score = base * multiplier, base is the row sum of contributions
+  (columns CONTRIBUTIONS), point the supports + non-maxed + rainbow part of base,
+  ranked lists row indices best first, ties go to the higher priority stat.
+  """
+  col = lambda name: matrix[:, _COL[name]]
+  gray_w, blue_w, green_w, friend_w = weights["levels"]
+  boost = weights["boost"]
+
+  non_maxed = gray_w * col("gray") + blue_w * col("blue") + green_w * col("green") - friend_w * col("friend_green")
+  rainbow = col("rainbow")
+  if boost:
+    non_maxed = np.where(non_maxed > 2, non_maxed + boost * non_maxed, non_maxed)
+    rainbow = np.where(rainbow > 1, rainbow + boost * rainbow, rainbow)
+
+  blue_flame_mask = np.array([stat in weights["blue_flame_stats"] for stat in stats], dtype=float)
+  contributions = np.column_stack((
+    weights["supports"] * col("supports"),
+    non_maxed,
+    weights["rainbow"] * rainbow,
+    weights["non_maxed_speed"] * col("non_maxed_speed"),
+    weights["hint"] * col("hint"),
+    weights["white_flame"] * col("white_flame"),
+    weights["blue_flame"] * col("blue_flame") * blue_flame_mask,
+    weights["wit"] * col("wit"),
+  ))
+  # added column by column so the result is bit-identical to adding the terms one after another
+  base = contributions[:, 0].copy()
+  for j in range(1, contributions.shape[1]):
+    base += contributions[:, j]
+  # friendship part of the score, what the custom failure conditions look at
+  point = contributions[:, 0] + contributions[:, 1] + contributions[:, 2]
+
+  priority = np.array([state.PRIORITY_STAT.index(s) if s in state.PRIORITY_STAT else 999 for s in stats])
+  mode = weights["multiplier"]
+  if mode is None:
+    multiplier = np.ones(len(stats))
+  else:
+    effects = state.SUMMER_PRIORITY_EFFECTS_LIST if mode == "summer" else state.PRIORITY_EFFECTS_LIST
+    priority_weight = PRIORITY_WEIGHTS[state.PRIORITY_WEIGHT]
+    multiplier = 1 + np.array([effects[p] for p in priority], dtype=float) * priority_weight
+  score = base * multiplier
+
+  # last key sorts first: score desc, then priority, then training order
+  ranked = np.lexsort((np.arange(len(stats)), priority, -score))
+  return Scores(stats, score, base, point, multiplier, contributions, priority, ranked)
+
+def score_trainings(results, scenario, year, summer=False, current_stats=None):
+  """Feature matrix + weights + scores for check_training results in one call."""
+  stats, matrix = feature_matrix(results, current_stats)
+  return score_matrix(stats, matrix, scenario_weights(scenario, year, summer))
+
+def best_of(scores, allowed=None):
+  """Highest ranked training whose name is in allowed (all when None), or None."""
+  for i in scores.ranked:
+    if allowed is None or scores.stats[i] in allowed:
+      return scores.stats[i]
+  return None
@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+
+import utils.constants as constants
+from utils.log import info, warning, error, debug
+from utils.screenshot import crop_frame, current_frame, grab_frame
+from core.recognizer import find_peaks
+from core.templates import get_template
+from utils.metrics import timed
+
+# (screen name, template, region constant, threshold) in the order the lobby handles them.
+# Regions are looked up by name every time, adjust_constants_x_coords shifts the *_REGION
+# constants for the emulator layout after this module is imported.
+SCREEN_RULES = [
+  ("complete", "assets/buttons/complete_btn.png", "GAME_SCREEN_REGION", 0.85),
+  ("acupuncture_accept", "assets/icons/acupuncture_confirm.png", "GAME_SCREEN_REGION", 0.85),
+  ("event", "assets/icons/event_choice_1.png", "GAME_SCREEN_REGION", 0.9),
+  ("inspiration", "assets/buttons/inspiration_btn.png", "GAME_SCREEN_REGION", 0.85),
+  ("view_result", "assets/buttons/view_results.png", "SCREEN_BOTTOM_REGION", 0.85),
+  ("next", "assets/buttons/next_btn.png", "SCREEN_BOTTOM_REGION", 0.85),
+  ("next2", "assets/buttons/next2_btn.png", "GAME_SCREEN_REGION", 0.85),
+  ("cancel", "assets/buttons/cancel_btn.png", "GAME_SCREEN_REGION", 0.85),
+  ("retry", "assets/buttons/retry_btn.png", "GAME_SCREEN_REGION", 0.85),
+  ("close", "assets/unity_cup/close_btn.png", "GAME_SCREEN_REGION", 0.85),
+  ("back_btn", "assets/buttons/back_btn.png", "SCREEN_BOTTOM_REGION", 0.85),
+  ("claw_credit", "assets/buttons/claw_credit.png", "GAME_SCREEN_REGION", 0.85),
+  ("claw_result", "assets/buttons/claw_result.png", "GAME_SCREEN_REGION", 0.85),
+  ("tazuna", "assets/ui/tazuna_hint.png", "GAME_SCREEN_REGION", 0.85),
+]
+
+# coarse pass runs on a downscaled ROI, a hit there is confirmed at full size
+COARSE_SCALE = 0.5
+COARSE_MARGIN = 0.15
+
+# change detection on 1/8 grayscale thumbnails: a region counts as changed when
+# more than SIGNATURE_PIXELS thumbnail pixels moved by more than SIGNATURE_DELTA
+SIGNATURE_SCALE = 0.125
+SIGNATURE_DELTA = 16
+SIGNATURE_PIXELS = 4
+
+# rule name -> (signature of its region when it was last matched, boxes)
+_rule_cache = {}
+_last_signature = None
+
+def signature(img):
+  gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+  return cv2.resize(gray, None, fx=SIGNATURE_SCALE, fy=SIGNATURE_SCALE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+def same_signature(a, b):
+  if a is None or b is None or a.shape != b.shape:
+    return False
+  return np.count_nonzero(np.abs(a - b) > SIGNATURE_DELTA) <= SIGNATURE_PIXELS
+
+def screen_changed(frame):
+  """True if frame differs from the one passed on the previous call."""
+  global _last_signature
+  sig = signature(frame)
+  changed = not same_signature(sig, _last_signature)
+  _last_signature = sig
+  return changed
+
+def reset_screen_cache():
+  global _last_signature
+  _last_signature = None
+  _rule_cache.clear()
+
+def _locate(roi, small, template, threshold):
+  """Boxes of template in roi (roi coordinates), using the downscaled copy to find candidates."""
+  color = template.color
+  h, w = color.shape[:2]
+  if roi.shape[0] < h or roi.shape[1] < w:
+    return []
+
+  small_template, _ = template.scaled(COARSE_SCALE)
+  sh, sw = small_template.shape[:2]
+  if small.shape[0] < sh or small.shape[1] < sw:
+    return []
+  coarse = cv2.matchTemplate(small, small_template, cv2.TM_CCOEFF_NORMED)
+  candidates = find_peaks(coarse, small_template.shape, threshold - COARSE_MARGIN)
+
+  boxes = []
+  pad = int(round(1 / COARSE_SCALE)) + 1
+  for x, y, _, _ in candidates:
+    # confirm in a window around the candidate at full resolution
+    left = max(int(x / COARSE_SCALE) - pad, 0)
+    top = max(int(y / COARSE_SCALE) - pad, 0)
+    window = roi[top:top + h + 2 * pad, left:left + w + 2 * pad]
+    if window.shape[0] < h or window.shape[1] < w:
+      continue
+    result = cv2.matchTemplate(window, color, cv2.TM_CCOEFF_NORMED)
+    for bx, by, bw, bh in find_peaks(result, color.shape, threshold):
+      box = (left + bx, top + by, bw, bh)
+      if box not in boxes:
+        boxes.append(box)
+  return boxes
+
+@timed("recognizer.classify_screen")
+def classify_screen(frame=None, rules=SCREEN_RULES):
+  """
+  Name of the first rule whose template is on screen and its boxes in screen coordinates.
+  Returns (None, []) when nothing matched.
+  """
+  if frame is None:
+    frame = current_frame()
+  if frame is None:
+    frame = grab_frame()
+  downscaled = {}
+
+  for name, path, region_name, threshold in rules:
+    template = get_template(path)
+    if template is None:
+      continue
+
+    region = getattr(constants, region_name)
+    if region_name not in downscaled:
+      roi = crop_frame(region, frame)
+      downscaled[region_name] = (roi, None, signature(roi))
+    roi, small, sig = downscaled[region_name]
+
+    # region looks the same as when this rule last ran, its answer can't have changed
+    cached = _rule_cache.get(name)
+    if cached is not None and same_signature(cached[0], sig):
+      boxes = cached[1]
+    else:
+      if small is None:
+        small = cv2.resize(roi, None, fx=COARSE_SCALE, fy=COARSE_SCALE, interpolation=cv2.INTER_AREA)
+        downscaled[region_name] = (roi, small, sig)
+      boxes = _locate(roi, small, template, threshold)
+      _rule_cache[name] = (sig, boxes)
+
+    if boxes:
+      left, top = max(int(region[0]), 0), max(int(region[1]), 0)
+      return name, [(x + left, y + top, w, h) for x, y, w, h in boxes]
+
+  return None, []
@@ -1,58 +1,275 @@
-from utils.tools import sleep, drag_scroll
+from utils.tools import sleep, drag_scroll, wait_for_stable
+import hashlib
+import json
 import pyautogui
 import Levenshtein
+import cv2
 import numpy as np
+from rapidfuzz import fuzz, process
 
 import utils.constants as constants
 
 from utils.log import info, warning, error, debug
-from utils.screenshot import enhanced_screenshot
-from core.ocr import extract_text
+from utils.screenshot import enhanced_screenshot, refresh_frame, release_frame, crop_frame
+from core.ocr import extract_text, extract_number
+from core.glyph import read_number, learn_number
 from core.recognizer import match_template, is_btn_active
+from utils.metrics import timed
 import core.state as state
 
-def buy_skill():
-  pyautogui.moveTo(constants.SCROLLING_SELECTION_MOUSE_POS)
-  found = False
-  prev_img = None
-  same_count = 0
+SKILLS_JSON = "./scraper/data/skills.json"
+# rapidfuzz ratio an OCR'd row needs to count as a known skill name
+SKILL_NAME_CUTOFF = 85
+MAX_SCROLLS = 15
+
+# rows are keyed by their position in the whole list, this close counts as the same row
+ROW_BUCKET = 20
+# bands of the list used to measure how far a drag scrolled it, taken near both edges of the
+# previous crop so one of them is still in view after a drag of up to about the list height
+SCROLL_BAND_HEIGHT = 120
+SCROLL_BAND_MARGIN = 10
+SCROLL_MATCH_MIN = 0.8
+# shop prices after hint discounts, a cost read outside this range is a misread
+SKILL_COST_RANGE = (20, 800)
+
+# skill names from skills.json, loaded on first use
+_skill_names = None
+# row crop hash -> (OCR text, skills.json name or None), kept for the whole career
+_row_cache = {}
+
+def skill_names():
+  global _skill_names
+  if _skill_names is None:
+    try:
+      with open(SKILLS_JSON, encoding="utf-8") as f:
+        _skill_names = sorted({s["name"] for s in json.load(f) if s.get("name")})
+    except (OSError, ValueError) as e:
+      warning(f"Couldn't load {SKILLS_JSON}: {e}")
+      _skill_names = []
+  return _skill_names
+
+def resolve_skill_name(text: str):
+  """skills.json name closest to text, None if nothing is close enough."""
+  if not text:
+    return None
+  match = process.extractOne(text, skill_names(), scorer=fuzz.ratio, processor=str.lower, score_cutoff=SKILL_NAME_CUTOFF)
+  return match[0] if match else None
+
+def reset_skill_cache():
+  _row_cache.clear()
+
+def _row_hash(img):
+  # drop the low bits so compression noise doesn't split one row into several hashes
+  gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+  return hashlib.sha1((gray >> 3).tobytes() + bytes(str(gray.shape), "ascii")).hexdigest()
 
-  for i in range(15):
+def _read_row(region, frame):
+  """(row hash, text, skill name) of the row in region, OCR'd only the first time the crop is seen."""
+  key = _row_hash(crop_frame(region, frame))
+  cached = _row_cache.get(key)
+  if cached is None:
+    text = extract_text(enhanced_screenshot(region, frame))
+    cached = _row_cache[key] = (text, resolve_skill_name(text))
+  return (key,) + cached
+
+def _scroll_shift(prev, curr):
+  """Pixels the list content moved up between two crops of the list, None if it couldn't be told."""
+  if prev is None or prev.shape != curr.shape:
+    return None
+  h = prev.shape[0]
+  prev_gray = cv2.cvtColor(prev, cv2.COLOR_BGR2GRAY)
+  curr_gray = cv2.cvtColor(curr, cv2.COLOR_BGR2GRAY)
+  best = None
+  # bottom band when the list moved up, top band when it moved down
+  for top in (h - SCROLL_BAND_HEIGHT - SCROLL_BAND_MARGIN, SCROLL_BAND_MARGIN):
+    band = prev_gray[top:top + SCROLL_BAND_HEIGHT]
+    # a blank band matches anywhere
+    if band.std() < 1:
+      continue
+    result = cv2.matchTemplate(curr_gray, band, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (_, y) = cv2.minMaxLoc(result)
+    if score >= SCROLL_MATCH_MIN and (best is None or score > best[0]):
+      best = (score, top - y)
+  return best[1] if best else None
+
+def _seen(seen, position):
+  bucket = round(position / ROW_BUCKET)
+  return any(b in seen for b in (bucket - 1, bucket, bucket + 1)), bucket
+
+def _scroll_pages(drag_from, distance):
+  """
+  Yield (frame, offset) at every scroll position of the skill list until it stops moving.
+  offset is how far the list scrolled since the first page, None once it lost track.
+  """
+  offset = 0
+  prev_list = None
+  for _ in range(MAX_SCROLLS):
     if state.stop_event.is_set():
       return
-    if i > 10:
-      sleep(0.5)
-    buy_skill_icon = match_template("assets/icons/buy_skill.png", threshold=0.9)
-
-    if buy_skill_icon:
-      for x, y, w, h in buy_skill_icon:
-        region = (x - 420, y - 40, w + 275, h + 5)
-        screenshot = enhanced_screenshot(region)
-
-        curr_img = np.array(screenshot)
-        if prev_img is not None:
-          if np.array_equal(curr_img, prev_img):
-            same_count += 1
-          else:
-            same_count = 0
-
-          if same_count >= 1:
-            info("Skill list unchanged for 1 loops. Exiting early.")
-            return found
-        prev_img = curr_img
-
-        text = extract_text(screenshot)
-        if is_skill_match(text, state.SKILL_LIST):
-          button_region = (x, y, w, h)
-          if is_btn_active(button_region):
-            info(f"Buy {text}")
-            pyautogui.click(x=x + 5, y=y + 5, duration=0.15)
-            found = True
-          else:
-            info(f"{text} found but not enough skill points.")
-
-    drag_scroll(constants.SKILL_SCROLL_BOTTOM_MOUSE_POS, -450)
+    frame = refresh_frame()
+    curr_list = crop_frame(constants.SKILL_LIST_REGION, frame).copy()
+
+    if prev_list is not None:
+      shift = _scroll_shift(prev_list, curr_list)
+      if shift is not None and abs(shift) < ROW_BUCKET / 2:
+        return
+      offset = offset + shift if shift is not None and offset is not None else None
+    prev_list = curr_list
+
+    yield frame, offset
+    drag_scroll(drag_from, distance)
+    # the list keeps gliding after the drag, read it once it has stopped
+    wait_for_stable(constants.SCREEN_MIDDLE_REGION, timeout=1)
+
+def _buy_buttons(frame):
+  left, top, width, height = constants.SKILL_LIST_REGION
+  boxes = match_template("assets/icons/buy_skill.png", (left, top, left + width, top + height), threshold=0.9, frame=frame)
+  return [(x + left, y + top, w, h) for x, y, w, h in boxes]
+
+def _name_region(box):
+  x, y, w, h = box
+  return (x - 420, y - 40, w + 275, h + 5)
+
+def _cost_region(box):
+  # the cost, hint discount already applied, is printed left of the buy button
+  x, y, w, h = box
+  return (x - 95, y - 2, 70, h + 4)
+
+def _read_cost(box, frame):
+  """Cost of the row, -1 when neither the glyphs nor OCR give a plausible price."""
+  low, high = SKILL_COST_RANGE
+  region = _cost_region(box)
+  strip = crop_frame(region, frame)
+  cost = read_number(strip, "skill_cost", anchor_right=True)
+  if low <= cost <= high:
+    return cost
+  cost = extract_number(enhanced_screenshot(region, frame))
+  if not low <= cost <= high:
+    return -1
+  learn_number(strip, "skill_cost", cost, anchor_right=True)
+  return cost
+
+def skill_priorities(skill_list):
+  """
+  skills.json name -> value for the knapsack. Each entry is worth more than all the entries
+  after it together, so the plan never gives up a skill for several lower ones.
+  """
+  priorities = {}
+  for i, skill in enumerate(skill_list):
+    # config names go through the same index so small spelling differences still match
+    priorities.setdefault(resolve_skill_name(skill) or skill, 2 ** (len(skill_list) - 1 - i))
+  return priorities
+
+def _priority(name, text, priorities):
+  if name in priorities:
+    return priorities[name]
+  if name is None:
+    for skill, value in priorities.items():
+      if is_skill_match(text, [skill]):
+        return value
+  return None
+
+def scan_skills(priorities):
+  """
+  Read the whole list once, top to bottom, without buying anything.
+  Returns {row hash: {"name", "cost", "value"}} for the rows in priorities.
+  """
+  rows = {}
+  seen = set()
+  for frame, offset in _scroll_pages(constants.SKILL_SCROLL_BOTTOM_MOUSE_POS, -450):
+    for box in _buy_buttons(frame):
+      # rows already handled at this list position are skipped without hashing or OCR
+      if offset is not None:
+        already, bucket = _seen(seen, offset + box[1])
+        if already:
+          continue
+        seen.add(bucket)
+
+      key, text, name = _read_row(_name_region(box), frame)
+      if key in rows:
+        continue
+      value = _priority(name, text, priorities)
+      if value is None:
+        continue
+      rows[key] = {"name": name or text, "cost": _read_cost(box, frame), "value": value}
+  return rows
+
+def plan_purchases(rows, budget):
+  """
+  Row hashes of the set of rows with the highest total value whose costs fit in budget (0/1 knapsack).
+  Rows whose cost couldn't be read are left out.
+  """
+  # points spent -> (value, row hashes), only reachable totals are kept
+  best = {0: (0, ())}
+  for key, row in rows.items():
+    cost = row["cost"]
+    if cost < 0:
+      warning(f"Couldn't read the cost of {row['name']}, skipping it.")
+      continue
+    for spent, (value, keys) in list(best.items()):
+      total = spent + cost
+      if total > budget:
+        continue
+      current = best.get(total)
+      if current is None or current[0] < value + row["value"]:
+        best[total] = (value + row["value"], keys + (key,))
+
+  # most value, then fewest points spent
+  spent, (value, keys) = max(best.items(), key=lambda item: (item[1][0], -item[0]))
+  return set(keys)
+
+@timed("skill.buy_skill")
+def buy_skill(budget=None):
+  """
+  Buy the best set of SKILL_LIST skills that fits in budget skill points, earlier entries
+  first (see skill_priorities). The list is scanned once, scrolled back to the top and the
+  planned rows are bought on the way down.
+  """
+  pyautogui.moveTo(constants.SCROLLING_SELECTION_MOUSE_POS)
+  priorities = skill_priorities(state.SKILL_LIST or [])
+
+  rows = scan_skills(priorities)
+  if state.stop_event.is_set():
+    return
+  if budget is None or budget < 0:
+    budget = sum(row["cost"] for row in rows.values() if row["cost"] > 0)
+  plan = plan_purchases(rows, budget)
+  for key, row in rows.items():
+    debug(f"[SKILL] {row['name']}: cost {row['cost']}, value {row['value']}{' -> buy' if key in plan else ''}")
+  if not plan:
+    return False
+
+  # back to the top, then buy on the way down
+  for _ in _scroll_pages(constants.SKILL_SCROLL_TOP_MOUSE_POS, 450):
+    pass
+
+  # a row that renders a little differently after the scroll back hashes differently, match it by name then
+  planned_names = {rows[key]["name"]: key for key in plan}
+  found = False
+  bought = set()
+  for frame, _ in _scroll_pages(constants.SKILL_SCROLL_BOTTOM_MOUSE_POS, -450):
+    for box in _buy_buttons(frame):
+      key, text, name = _read_row(_name_region(box), frame)
+      if key not in plan:
+        key = planned_names.get(name or text)
+      if key is None or key in bought:
+        continue
+      bought.add(key)
+      if is_btn_active(box, frame=frame):
+        info(f"Buy {rows[key]['name']}")
+        x, y, w, h = box
+        pyautogui.click(x=x + 5, y=y + 5, duration=0.15)
+        release_frame()
+        # the purchase lowers the points left, the rows below are checked against a new capture
+        frame = refresh_frame()
+        found = True
+      else:
+        info(f"{rows[key]['name']} found but not enough skill points.")
+    if bought >= plan:
+      break
 
+  for key in plan - bought:
+    warning(f"{rows[key]['name']} was planned but not found on the way down.")
   return found
 
 def is_skill_match(text: str, skill_list: list[str], threshold: float = 0.9) -> bool:
@@ -60,4 +277,4 @@ def is_skill_match(text: str, skill_list: list[str], threshold: float = 0.9) ->
     similarity = Levenshtein.ratio(text.lower(), skill.lower())
     if similarity >= threshold:
       return True
-  return False
\ No newline at end of file
+  return False
@@ -4,13 +4,17 @@ import re
 import difflib
 import json
 import threading
+from dataclasses import dataclass, fields, replace
 from math import floor
+from types import MappingProxyType
 
 from utils.log import info, warning, error, debug
 
-from utils.screenshot import capture_region, enhanced_screenshot
-from core.ocr import extract_text, extract_number, extract_text_improved, extract_percent
-from core.recognizer import match_template, count_pixels_of_color, find_color_of_pixel, closest_color, multi_match_templates
+from utils.screenshot import capture_region, enhanced_screenshot, crop_frame, crop_bbox
+from core.ocr import extract_text, extract_number, extract_text_improved, extract_percent, read_regions, parse_number, configure_ocr, DIGITS
+from core.glyph import read_number, learn_number
+from core.recognizer import match_template, count_pixels_of_color, find_color_of_pixel, closest_color, multi_match_templates, multi_match_shared
+from core.screens import classify_screen
 
 import utils.constants as constants
 
@@ -48,6 +52,10 @@ FAN_COUNT = -1
 TRAINING_RESTRICTED = None
 LAST_VALID_STATS = None
 VIRTUAL_TURN = None
+RECORD_FRAMES = False
+RECORD_DIR = "recordings"
+# snapshot of the last lobby read, see TurnState
+TURN_STATE = None
 
 TURN_REGION = (0,0,0,0)
 YEAR_REGION = (0,0,0,0)
@@ -70,6 +78,7 @@ def reload_config():
   global IS_AUTO_BUY_SKILL, SKILL_PTS_CHECK, SKILL_LIST, DESIRE_SKILL
   global TURN_REGION, YEAR_REGION, FAILURE_REGION, FAILURE_PERCENT_REGION, TURN_NUMBER_REGION
   global UNITY_TEAM_PREFERENCE, UNITY_SPIRIT_BURST_POSITION
+  global RECORD_FRAMES, RECORD_DIR
 
   config = load_config()
 
@@ -116,6 +125,11 @@ def reload_config():
   # STOP_BEFORE_RACE = config["stop_bot_before_race"]
   SUMMER_PRIORITY_EFFECTS_LIST = {i: v for i, v in enumerate(config["summer_priority_weights"])}
   POSITION_FOR_SPECIFIC_RACE = config["position_for_specific_race"]
+  # presets saved from the web UI may not have these sections, update_config only fills them at server start
+  configure_ocr(config.get("ocr", {}))
+  record = config.get("record", {})
+  RECORD_FRAMES = record.get("enabled", False)
+  RECORD_DIR = record.get("dir", "recordings")
 
   # URA Starter
   if "URA" in SCENARIO_NAME:
@@ -133,9 +147,81 @@ def reload_config():
     FAILURE_REGION=(250, 760, 855 - 250, 810 - 760)
     FAILURE_PERCENT_REGION=(250, 780, 855 - 250, 810 - 780)
 
-# Get Stat
-def stat_state():
-  stat_regions = {
+@dataclass(frozen=True, slots=True)
+class TurnState:
+  """Everything read from the lobby for one turn. Built once, never mutated, logic reads from it."""
+  energy: int
+  max_energy: int
+  mood: str
+  mood_index: int
+  turn: object  # turns left (int), or "Race Day"/"Goal"
+  year: str
+  criteria: str
+  virtual_turn: int
+  stats: MappingProxyType
+  fan_count: int = -1
+  done_debut: bool = False
+
+  @property
+  def missing_energy(self):
+    return self.max_energy - self.energy
+
+  def with_values(self, **changes):
+    """Copy with some fields replaced, e.g. after the fan count was read."""
+    return replace(self, **changes)
+
+  def to_dict(self):
+    data = {f.name: getattr(self, f.name) for f in fields(self)}
+    data["stats"] = dict(self.stats)
+    return data
+
+  @classmethod
+  def from_dict(cls, data):
+    data = dict(data)
+    data["stats"] = MappingProxyType(dict(data.get("stats") or {}))
+    return cls(**data)
+
+def read_turn_state():
+  """One pass over the lobby frame: energy, mood, turn, year, criteria and stats."""
+  energy_level, max_energy = check_energy_level()
+  # single-line fields in one recognizer call without the detector, each check falls back to its own read
+  lobby_text = read_lobby_text()
+  mood = check_mood(lobby_text.get("mood"))
+  turn = check_turn(lobby_text.get("turn_number"))
+  year = check_current_year(lobby_text.get("year"))
+  criteria = check_criteria()
+  current_stats = check_stats(lobby_text)
+
+  return TurnState(
+    energy=energy_level,
+    max_energy=max_energy,
+    mood=mood,
+    mood_index=constants.MOOD_LIST.index(mood),
+    turn=turn,
+    year=year,
+    criteria=criteria,
+    virtual_turn=get_virtual_turn(year, criteria),
+    stats=MappingProxyType(dict(current_stats)),
+    fan_count=FAN_COUNT,
+    done_debut=DONE_DEBUT,
+  )
+
+def set_turn_state(turn_state):
+  """Make turn_state current, the old per-field globals are mirrored for code that still reads them."""
+  global TURN_STATE, CURRENT_ENERGY_LEVEL, MAX_ENERGY, CURRENT_MOOD_INDEX, CURRENT_STATS
+  global CURRENT_YEAR, CURRENT_TURN_LEFT, CRITERIA, VIRTUAL_TURN
+  TURN_STATE = turn_state
+  CURRENT_ENERGY_LEVEL = turn_state.energy
+  MAX_ENERGY = turn_state.max_energy
+  CURRENT_MOOD_INDEX = turn_state.mood_index
+  CURRENT_STATS = dict(turn_state.stats)
+  CURRENT_YEAR = turn_state.year
+  CURRENT_TURN_LEFT = turn_state.turn
+  CRITERIA = turn_state.criteria
+  VIRTUAL_TURN = turn_state.virtual_turn
+
+def _stat_regions():
+  return {
     "spd": constants.SPD_STAT_REGION,
     "sta": constants.STA_STAT_REGION,
     "pwr": constants.PWR_STAT_REGION,
@@ -143,10 +229,56 @@ def stat_state():
     "wit": constants.WIT_STAT_REGION
   }
 
+def read_lobby_text():
+  """
+  Read the single-line lobby fields (mood, year, turn number, stats) in one recognizer call, see read_regions.
+  Multi-line fields (turn label, criteria) still go through the detector.
+  """
+  fields = [
+    ("mood", constants.MOOD_REGION, None),
+    ("year", YEAR_REGION, None),
+  ]
+  texts = {}
+  numbers = [("turn_number", TURN_NUMBER_REGION, "turn")]
+  numbers += [(stat, region, "stat") for stat, region in _stat_regions().items()]
+  for name, region, glyph_set in numbers:
+    # numbers the glyph templates can read don't need the OCR model at all,
+    # they come back as ints, OCR reads as text
+    val = read_number(crop_frame(region), glyph_set)
+    if val > 0:
+      texts[name] = val
+    else:
+      fields.append((name, region, DIGITS))
+  texts.update(read_regions(fields))
+  return texts
+
+# Get Stat
+def stat_state(texts=None):
   result = {}
-  for stat, region in stat_regions.items():
+  for stat, region in _stat_regions().items():
+    # glyph templates first, OCR only when they can't read the value
+    text = texts.get(stat) if texts else None
+    if isinstance(text, int):
+      # already read by the glyphs in read_lobby_text
+      result[stat] = text
+      continue
+    strip = crop_frame(region)
+    if text is None:
+      val = read_number(strip, "stat")
+      if val > 0:
+        result[stat] = val
+        continue
+
+    val = parse_number(text) if text else -1
+    if val > 0:
+      learn_number(strip, "stat", val)
+      result[stat] = val
+      continue
+
     img = enhanced_screenshot(region)
     val = extract_number(img)
+    if val > 0:
+      learn_number(strip, "stat", val)
     try:
         val_int = int(val)
     except (TypeError, ValueError):
@@ -170,7 +302,7 @@ def stat_state():
     result[stat] = val
   return result
 
-def check_stats():
+def check_stats(texts=None):
     """
     Wrapper for stat_state().
     If any stat is -1 (OCR failure), return LAST_VALID_STATS instead.
@@ -178,7 +310,7 @@ def check_stats():
     """
     global LAST_VALID_STATS
 
-    new_stats = stat_state()
+    new_stats = stat_state(texts)
 
     # OCR error: some stats are -1
     if any(v == -1 for v in new_stats.values()):
@@ -194,25 +326,36 @@ def check_stats():
     return new_stats
 
 # Check support card in each training
-def check_support_card(threshold=0.8, target="none"):
-  SUPPORT_ICONS = {
-    "spd": "assets/icons/support_card_type_spd.png",
-    "sta": "assets/icons/support_card_type_sta.png",
-    "pwr": "assets/icons/support_card_type_pwr.png",
-    "guts": "assets/icons/support_card_type_guts.png",
-    "wit": "assets/icons/support_card_type_wit.png",
-    "friend": "assets/icons/support_card_type_friend.png"
-  }
+SUPPORT_ICONS = {
+  "spd": "assets/icons/support_card_type_spd.png",
+  "sta": "assets/icons/support_card_type_sta.png",
+  "pwr": "assets/icons/support_card_type_pwr.png",
+  "guts": "assets/icons/support_card_type_guts.png",
+  "wit": "assets/icons/support_card_type_wit.png",
+  "friend": "assets/icons/support_card_type_friend.png"
+}
 
-  count_result = {}
+SUPPORT_MARKERS = {
+  "hint": "assets/icons/support_hint.png",
+  "white_flame": "assets/unity_cup/white_flame.png",
+  "blue_flame": "assets/unity_cup/blue_flame.png",
+}
 
-  SUPPORT_FRIEND_LEVELS = {
-    "gray": [110,108,120],
-    "blue": [42,192,255],
-    "green": [162,230,30],
-    "yellow": [255,173,30],
-    "max": [255,235,120],
-  }
+SUPPORT_FRIEND_LEVELS = {
+  "gray": [110,108,120],
+  "blue": [42,192,255],
+  "green": [162,230,30],
+  "yellow": [255,173,30],
+  "max": [255,235,120],
+}
+
+# friendship bar sits this far below the type icon's center
+ICON_TO_FRIEND_BAR_DISTANCE = 66
+# markers within this many pixels (vertically) of a type icon belong to that card
+SLOT_TOLERANCE = 45
+
+def check_support_card(threshold=0.8, target="none", frame=None):
+  count_result = {}
 
   count_result["total_supports"] = 0
   count_result["total_non_maxed_support"] = 0
@@ -221,61 +364,73 @@ def check_support_card(threshold=0.8, target="none"):
   count_result["hints_per_friend_level"] = {}
   count_result["total_white_flame"] = 0
   count_result["total_blue_flame"] = 0
+  count_result["slots"] = []
 
-  for friend_level, color in SUPPORT_FRIEND_LEVELS.items():
+  for friend_level in SUPPORT_FRIEND_LEVELS:
     count_result["total_friendship_levels"][friend_level] = 0
     count_result["hints_per_friend_level"][friend_level] = 0
 
-  hint_matches = match_template("assets/icons/support_hint.png", constants.SUPPORT_CARD_ICON_BBOX, threshold)
-  white_flame_matches = match_template("assets/unity_cup/white_flame.png", constants.SUPPORT_CARD_ICON_BBOX, threshold)
-  blue_flame_matches = match_template("assets/unity_cup/blue_flame.png", constants.SUPPORT_CARD_ICON_BBOX, threshold)
-
-  def _dedup(rects, tol=10):
-        uniq = []
-        for (x,y,w,h) in sorted(rects or [], key=lambda r:(r[1], r[0])):
-            if not uniq or abs(y - uniq[-1][1]) > tol or abs(x - uniq[-1][0]) > tol:
-                uniq.append((x,y))
-        return len(uniq)
-
-  count_result["total_white_flame"] = _dedup(white_flame_matches)
-  count_result["total_blue_flame"]  = _dedup(blue_flame_matches)
-
-  for key, icon_path in SUPPORT_ICONS.items():
+  for key in SUPPORT_ICONS:
     count_result[key] = {}
     count_result[key]["supports"] = 0
     count_result[key]["hints"] = 0
-    count_result[key]["friendship_levels"]={}
-
-    for friend_level, color in SUPPORT_FRIEND_LEVELS.items():
+    count_result[key]["friendship_levels"] = {}
+    for friend_level in SUPPORT_FRIEND_LEVELS:
       count_result[key]["friendship_levels"][friend_level] = 0
 
-    matches = match_template(icon_path, constants.SUPPORT_CARD_ICON_BBOX, threshold)
-    for match in matches:
-      # add the support as a specific key
-      count_result[key]["supports"] += 1
-      # also add it to the grand total
-      count_result["total_supports"] += 1
-
-      #find friend colors and add them to their specific colors
-      x, y, w, h = match
-      match_horizontal_middle = floor((2*x+w)/2)
-      match_vertical_middle = floor((2*y+h)/2)
-      icon_to_friend_bar_distance = 66
-      bbox_left = match_horizontal_middle + constants.SUPPORT_CARD_ICON_BBOX[0]
-      bbox_top = match_vertical_middle + constants.SUPPORT_CARD_ICON_BBOX[1] + icon_to_friend_bar_distance
-      wanted_pixel = (bbox_left, bbox_top, bbox_left+1, bbox_top+1)
-      friendship_level_color = find_color_of_pixel(wanted_pixel)
-      friend_level = closest_color(SUPPORT_FRIEND_LEVELS, friendship_level_color)
-      count_result[key]["friendship_levels"][friend_level] += 1
-      count_result["total_friendship_levels"][friend_level] += 1
-
-      if hint_matches:
-        for hint_match in hint_matches:
-          distance = abs(hint_match[1] - match[1])
-          if distance < 45:
-            count_result["total_hints"] += 1
-            count_result[key]["hints"] += 1
-            count_result["hints_per_friend_level"][friend_level] +=1
+  # one crop of the support strip, every icon and friendship bar is read from it
+  bbox = constants.SUPPORT_CARD_ICON_BBOX
+  strip = crop_bbox(bbox, frame)
+  scored = multi_match_shared({**SUPPORT_ICONS, **SUPPORT_MARKERS}, strip, threshold, with_scores=True)
+  matches = {name: [box for box, _ in peaks] for name, peaks in scored.items()}
+
+  count_result["total_white_flame"] = len(matches["white_flame"])
+  count_result["total_blue_flame"] = len(matches["blue_flame"])
+
+  # one slot per type icon, if two type templates hit the same card the better score wins
+  icons = []
+  candidates = sorted(
+    ((box, key, score) for key in SUPPORT_ICONS for box, score in scored[key]),
+    key=lambda item: -item[2]
+  )
+  for box, key, score in candidates:
+    if all(abs(box[1] - other[1]) >= box[3] // 2 for other, _, _ in icons):
+      icons.append((box, key, score))
+  icons.sort(key=lambda item: item[0][1])
+
+  for (x, y, w, h), key, score in icons:
+    # add the support as a specific key and to the grand total
+    count_result[key]["supports"] += 1
+    count_result["total_supports"] += 1
+
+    # friendship bar color from the same strip, outside of it only if the bar is below the bbox
+    bar_x = floor((2*x+w)/2)
+    bar_y = floor((2*y+h)/2) + ICON_TO_FRIEND_BAR_DISTANCE
+    if bar_y < strip.shape[0]:
+      friendship_level_color = strip[bar_y, bar_x, ::-1]
+    else:
+      friendship_level_color = find_color_of_pixel((bbox[0] + bar_x, bbox[1] + bar_y), frame=frame)
+    friend_level = closest_color(SUPPORT_FRIEND_LEVELS, friendship_level_color)
+    count_result[key]["friendship_levels"][friend_level] += 1
+    count_result["total_friendship_levels"][friend_level] += 1
+
+    def _in_slot(name):
+      return sum(1 for marker in matches[name] if abs(marker[1] - y) < SLOT_TOLERANCE)
+
+    hints = _in_slot("hint")
+    if hints:
+      count_result["total_hints"] += hints
+      count_result[key]["hints"] += hints
+      count_result["hints_per_friend_level"][friend_level] += hints
+
+    count_result["slots"].append({
+      "type": key,
+      "score": score,
+      "friendship_level": friend_level,
+      "hints": hints,
+      "white_flame": _in_slot("white_flame"),
+      "blue_flame": _in_slot("blue_flame"),
+    })
 
   count_result["total_non_maxed_support"] = count_result["total_supports"] - (count_result["total_friendship_levels"]["yellow"] + count_result["total_friendship_levels"]["max"])
 
@@ -314,9 +469,14 @@ def _parse_failure_digits(raw: str) -> int | None:
 
     return None
 
-def check_failure():
-    failure_text = enhanced_screenshot(FAILURE_REGION)
-    failure_percent = enhanced_screenshot(FAILURE_PERCENT_REGION)
+def check_failure(frame=None):
+    percent_strip = crop_frame(FAILURE_PERCENT_REGION, frame)
+    v = read_number(percent_strip, "failure", suffix="%", anchor_right=True)
+    if 0 <= v <= 100:
+        return v
+
+    failure_text = enhanced_screenshot(FAILURE_REGION, frame)
+    failure_percent = enhanced_screenshot(FAILURE_PERCENT_REGION, frame)
 
     label = extract_text(failure_text).lower()
     pct_text = extract_text(failure_percent)
@@ -332,6 +492,9 @@ def check_failure():
     if hits:
       v = int(hits[-1].group(1).replace(" ", ""))
       if 0 <= v <= 100:
+        # only a badge that read as nothing but the percentage is worth a glyph vote
+        if re.fullmatch(r'\s*\d{1,3}\s*%\s*', pct_text):
+          learn_number(percent_strip, "failure", v, suffix="%", anchor_right=True)
         return v
 
     # 2) legacy fallbacks on the full label text
@@ -348,7 +511,12 @@ def check_failure():
     return 99
 
 # Check mood
-def check_mood():
+def check_mood(text=None):
+  if text:
+    for known_mood in constants.MOOD_LIST:
+      if known_mood in text.upper():
+        return known_mood
+
   mood = enhanced_screenshot(constants.MOOD_REGION)
   mood_text = extract_text(mood).upper()
 
@@ -360,12 +528,26 @@ def check_mood():
   return "UNKNOWN"
 
 # Check turn
-def check_turn():
+def check_turn(number_text=None):
+    # an int is a glyph read from read_lobby_text, text means the glyphs already failed
+    if isinstance(number_text, int):
+        if 0 < number_text < 50:
+            return number_text
+        number_text = None
+    number_strip = crop_frame(TURN_NUMBER_REGION)
+    if number_text is None:
+        glyph_turn = read_number(number_strip, "turn")
+        if 0 < glyph_turn < 50:
+            return glyph_turn
+
     turn = enhanced_screenshot(TURN_REGION)
     turn_text = extract_text(turn)
 
-    turn_num = enhanced_screenshot(TURN_NUMBER_REGION)
-    turn_num_ex = extract_number(turn_num)
+    if number_text is not None:
+        turn_num_ex = parse_number(number_text)
+    else:
+        turn_num = enhanced_screenshot(TURN_NUMBER_REGION)
+        turn_num_ex = extract_number(turn_num)
 
     # debug(f"raw_turn_text: {turn_text}")
     # debug(f"raw_turn_num: {turn_num_ex}")
@@ -382,10 +564,12 @@ def check_turn():
 
     if digits_only:
       if 0 < int(digits_only) < 50:
+        learn_number(number_strip, "turn", int(digits_only))
         return int(digits_only)
 
     if turn_num_ex:
         if 0 < int(turn_num_ex) < 50:
+          learn_number(number_strip, "turn", int(turn_num_ex))
           return int(turn_num_ex)
 
     # if normal version fail use improved version
@@ -410,12 +594,21 @@ def _norm(s: str) -> str:
     # normalize OCR noise: collapse spaces, lowercase
     return re.sub(r"\s+", " ", s or "").strip().casefold()
 
-def check_unity() -> str:
+UNITY_RACE_RULE = [("unity_race", "assets/unity_cup/unity_race_btn.png", "GAME_SCREEN_REGION", 0.8)]
+
+def check_unity(force=False, frame=None) -> str:
     """
     Returns the canonical round name ONLY if OCR text is in UNITY_ROUND_LIST.
     Otherwise returns "".
+    force: skip the race button pre-check, for screens where the button is already gone.
     """
-    img = enhanced_screenshot(constants.UNITY_ROUND_REGION)
+    if "Unity" not in SCENARIO_NAME:
+        return ""
+    # the round label only matters on race day, when the unity race button is up
+    if not force and not classify_screen(frame, UNITY_RACE_RULE)[0]:
+        return ""
+
+    img = enhanced_screenshot(constants.UNITY_ROUND_REGION, frame)
     raw = extract_text(img)
 
     # build normalized lookup of allowed rounds
@@ -431,7 +624,9 @@ def check_unity() -> str:
     return canon_by_norm[match[0]] if match else None
 
 # Check year
-def check_current_year():
+def check_current_year(text=None):
+  if text and any(y in text for y in constants.YEAR_ORDER + ["Finale"]):
+    return text
   year = enhanced_screenshot(YEAR_REGION)
   text = extract_text(year)
   return text
@@ -508,8 +703,14 @@ def check_credit():
   return text
 
 def check_skill_pts():
+  strip = crop_frame(constants.SKILL_PTS_REGION)
+  pts = read_number(strip, "skill_pts")
+  if pts >= 0:
+    return pts
+
   img = enhanced_screenshot(constants.SKILL_PTS_REGION)
   text = extract_number(img)
+  learn_number(strip, "skill_pts", text)
   return text
 
 previous_right_bar_match=""
@@ -630,8 +831,7 @@ APTITUDES = {}
 def check_aptitudes():
   global APTITUDES
 
-  image = capture_region(constants.FULL_STATS_APTITUDE_REGION)
-  image = np.array(image)
+  image = crop_frame(constants.FULL_STATS_APTITUDE_REGION)
   h, w = image.shape[:2]
 
   # Ratios for each aptitude box (x, y, width, height) in percentages
@@ -664,7 +864,7 @@ def check_aptitudes():
   crops = {}
   for key, (xr, yr, wr, hr) in boxes.items():
     x, y, ww, hh = int(xr*w), int(yr*h), int(wr*w), int(hr*h)
-    cropped_image = np.array(image[y:y+hh, x:x+ww])
+    cropped_image = image[y:y+hh, x:x+ww]
     matches = multi_match_templates(aptitude_images, cropped_image)
     for name, match in matches.items():
       if match:
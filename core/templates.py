@@ -0,0 +1,108 @@
+import os
+import cv2
+import numpy as np
+
+from utils.log import info, warning, error, debug
+
+ASSETS_DIR = "assets"
+
+class Template:
+  """Decoded template image, kept in memory for the whole process."""
+  __slots__ = ("path", "mtime", "color", "gray", "_scaled", "_spectra")
+
+  def __init__(self, path, mtime, color):
+    self.path = path
+    self.mtime = mtime
+    self.color = color
+    self.gray = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+    self._scaled = {}
+    self._spectra = {}
+
+  @property
+  def shape(self):
+    return self.color.shape
+
+  def scaled(self, scale: float):
+    """(color, gray) resized by scale, computed once per scale."""
+    if scale == 1:
+      return self.color, self.gray
+    pair = self._scaled.get(scale)
+    if pair is None:
+      h, w = self.color.shape[:2]
+      size = (max(1, round(w * scale)), max(1, round(h * scale)))
+      color = cv2.resize(self.color, size, interpolation=cv2.INTER_AREA)
+      pair = (color, cv2.cvtColor(color, cv2.COLOR_BGR2GRAY))
+      self._scaled[scale] = pair
+    return pair
+
+  def spectrum(self, size):
+    """
+    (per-channel DFTs of the zero-mean color template padded to size (height, width), its energy),
+    computed once per size. See recognizer.multi_match_shared.
+    """
+    cached = self._spectra.get(size)
+    if cached is None:
+      h, w = self.color.shape[:2]
+      zero_mean = self.color.astype(np.float32) - self.color.reshape(-1, 3).mean(axis=0)
+      spectra = []
+      for c in range(3):
+        padded = np.zeros(size, np.float32)
+        padded[:h, :w] = zero_mean[:, :, c]
+        spectra.append(cv2.dft(padded, nonzeroRows=h))
+      cached = (spectra, float(np.square(zero_mean, dtype=np.float64).sum()))
+      self._spectra[size] = cached
+    return cached
+
+# normalized path -> Template
+_TEMPLATES: dict[str, Template] = {}
+
+def _key(path: str) -> str:
+  return os.path.normpath(path)
+
+def _load(path: str, mtime: int):
+  color = cv2.imread(path, cv2.IMREAD_COLOR)
+  if color is None:
+    warning(f"Couldn't load template: {path}")
+    return None
+  return Template(path, mtime, color)
+
+def get_template(path: str):
+  """
+  Return the cached Template for path, decoding it only the first time
+  or when the file changed on disk. None if the file can't be read.
+  """
+  key = _key(path)
+  try:
+    mtime = os.stat(key).st_mtime_ns
+  except OSError:
+    _TEMPLATES.pop(key, None)
+    return None
+
+  template = _TEMPLATES.get(key)
+  if template is None or template.mtime != mtime:
+    template = _load(key, mtime)
+    if template is None:
+      _TEMPLATES.pop(key, None)
+      return None
+    _TEMPLATES[key] = template
+  return template
+
+def get_color(path: str):
+  template = get_template(path)
+  return template.color if template is not None else None
+
+def preload_templates(root: str = ASSETS_DIR, scales=()) -> int:
+  """Decode every image under root once, optionally with its scaled copies."""
+  count = 0
+  for dirpath, _, filenames in os.walk(root):
+    for name in filenames:
+      if not name.lower().endswith((".png", ".jpg")):
+        continue
+      template = get_template(os.path.join(dirpath, name))
+      if template is None:
+        continue
+      for scale in scales:
+        template.scaled(scale)
+      count += 1
+  debug(f"Templates loaded: {count}")
+  return count
@@ -1,12 +1,13 @@
 from tracemalloc import stop
-from PIL import ImageGrab
 from typing import Tuple, List, Optional
 from utils.log import info, warning, error, debug
+from utils.metrics import timed
 from core.recognizer import is_btn_active, match_template, multi_match_templates
-from utils.tools import click, sleep, get_secs, wait_for_image
+from utils.tools import click, sleep, get_secs, wait_for_image, wait_for_screen, wait_for_stable
 from utils.process import do_race, auto_buy_skill, race_day, do_rest, race_prep, after_race, do_recreation, do_train, go_to_training, check_training
 from core.state import check_status_effects, check_criteria, check_aptitudes, stop_bot, check_unity
 from core.logic import decide_race_for_goal, most_support_card, check_fans_for_upcoming_schedule
+from core.scoring import score_trainings, best_of
 from utils.scenario import ura, unity
 
 import core.state as state
@@ -16,19 +17,6 @@ templates = {
   "infirmary": "assets/buttons/infirmary_btn.png",
 }
 
-PRIORITY_WEIGHTS_LIST={
-  "HEAVY": 0.75,
-  "MEDIUM": 0.5,
-  "LIGHT": 0.25,
-  "NONE": 0
-}
-
-# Get priority stat from config
-def _get_stat_priority(stat_key: str) -> int:
-  if stat_key in state.PRIORITY_STAT:
-    return state.PRIORITY_STAT.index(stat_key) 
-  return 999
-
 def _filter_by_stat_caps(results, current_stats):
   return {
     stat: data for stat, data in results.items()
@@ -40,8 +28,9 @@ def _friend_recreation() -> bool:
         return True
     return False
 
-def _need_recreation(year: str) -> bool:
-  current_mood = state.CURRENT_MOOD_INDEX
+def _need_recreation(turn_state) -> bool:
+  current_mood = turn_state.mood_index
+  year = turn_state.year
   minimum_mood = constants.MOOD_LIST.index(state.MINIMUM_MOOD)
   minimum_mood_with_friend = constants.MOOD_LIST.index(state.MINIMUM_MOOD_WITH_FRIEND)
   minimum_mood_junior_year = constants.MOOD_LIST.index(state.MINIMUM_MOOD_JUNIOR_YEAR)
@@ -59,10 +48,9 @@ def _need_recreation(year: str) -> bool:
   missing_mood =  mood_check - current_mood
   return missing_mood
 
-def _need_infirmary() -> Tuple[Optional[List[str]], int, Optional[object]]:
-  screen = ImageGrab.grab()
-  matches = multi_match_templates(templates, screen=screen)
-  if matches["infirmary"] and is_btn_active(matches["infirmary"][0]) and not _summer_camp(year=state.CURRENT_YEAR):
+def _need_infirmary(year: str) -> Tuple[Optional[List[str]], int, Optional[object]]:
+  matches = multi_match_templates(templates)
+  if matches["infirmary"] and is_btn_active(matches["infirmary"][0]) and not _summer_camp(year=year):
     info("Check for condition.")
     if click(img="assets/buttons/full_stats.png", minSearch=get_secs(1)):
       sleep(0.5)
@@ -73,13 +61,13 @@ def _need_infirmary() -> Tuple[Optional[List[str]], int, Optional[object]]:
         warning("Couldn't find full stats button.")
   return (None, 0, None)
 
-def _summer_next_turn(year: str) -> bool:
+def _summer_next_turn(year: str, turn) -> bool:
     year_parts = year.split(" ")
     if len(year_parts) < 4:
         return False
     if year_parts[0] in ["Classic", "Senior"] and year_parts[3] == "Jun":
         if year_parts[2] == "Early":
-            if state.CURRENT_TURN_LEFT == 1:
+            if turn == 1:
                 return True
             if any("Late Jun" in r.get("date", "") for r in state.RACE_SCHEDULE or []):
                 return True
@@ -110,101 +98,45 @@ def team_for_round(detected: str, default=None) -> int | None:
         return team
     return None
     
-def unity_race():
+@timed("logic.unity_race")
+def unity_race(race=None):
     unity()
 
-    race = check_unity()
+    # the lobby already read the round label, only OCR it again when it didn't
+    if not race:
+        race = check_unity(force=True)
     team = team_for_round(race)
-    sleep(2)
+    # wait for the team list to stop sliding in instead of a fixed 2s
+    wait_for_stable(constants.GAME_SCREEN_REGION)
     if team:
         unity_race_select(team)
-    
-    sleep(2)
+        wait_for_stable(constants.GAME_SCREEN_REGION)
+
     if not click(img="assets/unity_cup/race_select_btn.png", minSearch=get_secs(5)):
         click(boxes=(550, 820, 1, 1))
-    
-    sleep(2)
-    click(img="assets/unity_cup/race_confirm_btn.png", minSearch=get_secs(10))
+
+    confirm_btn, _ = wait_for_screen("assets/unity_cup/race_confirm_btn.png", timeout=10)
+    click(boxes=confirm_btn)
     click(img="assets/unity_cup/unity_result_btn.png", minSearch=get_secs(10))
     click(img="assets/unity_cup/race_skip_btn.png", minSearch=get_secs(10))
 
     after_race()
 
-def _training(results: dict):
-    global PRIORITY_WEIGHTS_LIST 
-    energy_level = state.CURRENT_ENERGY_LEVEL
-    year = state.CURRENT_YEAR
-    year_parts = year.split(" ")
-    priority_weight = PRIORITY_WEIGHTS_LIST[state.PRIORITY_WEIGHT]
+@timed("logic.unity_training")
+def _training(results: dict, turn_state):
+    energy_level = turn_state.energy
+    year = turn_state.year
 
     training_candidates = results
 
-    for stat_name in training_candidates:
-        if year_parts[0] == "Junior":
-            multiplier = 1
-        else:
-            multiplier = 1 + state.PRIORITY_EFFECTS_LIST[_get_stat_priority(stat_name)] * priority_weight
-        summer_multiplier = 1 + state.SUMMER_PRIORITY_EFFECTS_LIST[_get_stat_priority(stat_name)] * priority_weight
-
+    scores = score_trainings(training_candidates, "unity", year, summer=_summer_camp(year), current_stats=turn_state.stats)
+    for i, stat_name in enumerate(scores.stats):
         data = training_candidates[stat_name]
+        data["score_before_multiplier"] = float(scores.point[i])
+        data["training_score"] = float(scores.score[i])
 
-        max_friend_support_card = data["friend"]["friendship_levels"]["green"]  
-        friend_value =  1.02 * data["total_friendship_levels"]["gray"] \
-            + 1.01 * data["total_friendship_levels"]["blue"] \
-            + 1 * data["total_friendship_levels"]["green"] - max_friend_support_card
-        friend_training = data[stat_name]["friendship_levels"]["yellow"] + data[stat_name]["friendship_levels"]["max"]
-
-        non_maxed_speed = data["spd"]["friendship_levels"]["gray"] + data["spd"]["friendship_levels"]["blue"] + data["spd"]["friendship_levels"]["green"]
-        non_maxed_power = data["pwr"]["friendship_levels"]["gray"] + data["pwr"]["friendship_levels"]["blue"] + data["pwr"]["friendship_levels"]["green"]
-
-        if friend_value > 2:
-            friend_value += 0.25 * friend_value
-        if friend_training > 1:
-            friend_training += 0.25 * friend_training
-
-        friend_value_point = 1
-        rainbow_point = 1.5
-        WHITE_FLAME_POINT = 0.5
-        BLUE_FLAME_POINT = 2
-
-        if year_parts[0] == "Junior":
-            rainbow_point = 0.75
-        # elif year_parts[0] == "Classic":
-        #     friend_value_point = 1.5
-        # elif year_parts[0] == "Senior":
-        #     friend_value_point = 1.5
-        elif year_parts[0] == "Finale":
-            WHITE_FLAME_POINT = 0.25
-
-        if _summer_camp(year):
-            rainbow_point = 2
-            WHITE_FLAME_POINT = 0.25
-
-        score = (friend_value_point * friend_value) + (rainbow_point * friend_training)
-
-        data["score_before_multiplier"] = score
-
-        score += 0.25 * non_maxed_speed
-
-        if data["total_hints"] > 0:
-            score += state.HINT_POINT
-
-        score += WHITE_FLAME_POINT * data["total_white_flame"]
-        
-        if stat_name in state.UNITY_SPIRIT_BURST_POSITION:
-            score += BLUE_FLAME_POINT * data["total_blue_flame"]
-        # else:
-        #     score -= 0 * data["total_blue_flame"]
-
-        if stat_name == "wit":
-            score += 0.5
-
-        if _summer_camp(year):
-            data["training_score"] = score * summer_multiplier
-        else:
-            data["training_score"] = score * multiplier
-
-        info(f"[{stat_name.upper()}] -> Non Max Support: {friend_value:.3f}, Rainbow Support: {friend_training}, Hint: {data['total_hints']}, White Flame: {data['total_white_flame']}, Blue Flame: {data['total_blue_flame']}")
+        non_maxed, rainbow = scores.contributions[i, 1:3]
+        info(f"[{stat_name.upper()}] -> Non Max Support: {non_maxed:.3f}, Rainbow Support: {rainbow:.3f}, Hint: {data['total_hints']}, White Flame: {data['total_white_flame']}, Blue Flame: {data['total_blue_flame']}")
         info(f"[{stat_name.upper()}] -> Score: {data['training_score']:.3f}")
 
     any_nonmaxed = any(
@@ -262,22 +194,24 @@ def _training(results: dict):
     #     info("Only WIT available early; fallback to most-support.")
     #     return "fallback", None
 
-    best_key, best_data = max(
-        filtered.items(),
-        key=lambda kv: (kv[1]["training_score"], -_get_stat_priority(kv[0])))
-      
+    best_key = best_of(scores, filtered)
+    best_data = filtered[best_key]
+
     info(f"[UNITY] Training selected: {best_key.upper()} with {best_data['training_score']:.3f} points and {best_data['failure']}% fail chance")
     return best_key, best_data
 
-def unity_logic() -> str:
-    criteria = state.CRITERIA
-    turn = state.CURRENT_TURN_LEFT
-    year = state.CURRENT_YEAR
+@timed("logic.unity_logic")
+def unity_logic(turn_state=None) -> str:
+    if turn_state is None:
+        turn_state = state.TURN_STATE
+    criteria = turn_state.criteria
+    turn = turn_state.turn
+    year = turn_state.year
     year_parts = year.split(" ")
-    energy_level = state.CURRENT_ENERGY_LEVEL
-    max_energy = state.MAX_ENERGY
-    missing_energy = max_energy - energy_level
-    current_stats = state.CURRENT_STATS
+    energy_level = turn_state.energy
+    max_energy = turn_state.max_energy
+    missing_energy = turn_state.missing_energy
+    current_stats = dict(turn_state.stats)
 
     # if year == "Classic Year Early Jan":
     #     stop_bot()
@@ -353,9 +287,9 @@ def unity_logic() -> str:
                 click(img="assets/buttons/back_btn.png", minSearch=get_secs(1), text="Proceeding to training.")
                 sleep(0.5)
 
-    missing_mood = _need_recreation(year)
+    missing_mood = _need_recreation(turn_state)
     summer_camp = _summer_camp(year)
-    conditions, total_severity, infirmary_box = _need_infirmary()
+    conditions, total_severity, infirmary_box = _need_infirmary(year)
 
     go_to_training()
     sleep(0.5)
@@ -366,9 +300,9 @@ def unity_logic() -> str:
         info("All stats capped or no valid training")
         return
 
-    result, best_data = _training(filtered)
+    result, best_data = _training(filtered, turn_state)
 
-    if _summer_next_turn(year):
+    if _summer_next_turn(year, turn):
         if best_data is None and energy_level > 50:
             info("[UNITY] Summer camp next & okay energy → Train WIT.")
             sleep(0.5)
@@ -391,7 +325,7 @@ def unity_logic() -> str:
                 do_train("wit")
                 return
             elif best_data["training_score"] < 4:
-                if state.CURRENT_ENERGY_LEVEL <= 50:
+                if energy_level <= 50:
                     state.FORCE_REST = True
                     info("[UNITY] Summer camp next & low energy → Rest.")
                     do_rest(energy_level)
@@ -1,11 +1,12 @@
-from PIL import ImageGrab
 from typing import Tuple, List, Optional
 from utils.log import info, warning, error, debug
+from utils.metrics import timed
 from core.recognizer import is_btn_active, match_template, multi_match_templates
 from utils.tools import click, sleep, get_secs
 from utils.process import do_race, auto_buy_skill, race_day, do_rest, race_prep, after_race, do_recreation, do_train, go_to_training, check_training
 from core.state import check_status_effects, check_criteria, check_aptitudes, stop_bot
 from core.logic import decide_race_for_goal, most_support_card, check_fans_for_upcoming_schedule
+from core.scoring import score_trainings, best_of
 from utils.scenario import ura
 
 import core.state as state
@@ -15,19 +16,6 @@ templates = {
   "infirmary": "assets/buttons/infirmary_btn.png",
 }
 
-PRIORITY_WEIGHTS_LIST={
-  "HEAVY": 0.75,
-  "MEDIUM": 0.5,
-  "LIGHT": 0.25,
-  "NONE": 0
-}
-
-# Get priority stat from config
-def _get_stat_priority(stat_key: str) -> int:
-  if stat_key in state.PRIORITY_STAT:
-    return state.PRIORITY_STAT.index(stat_key) 
-  return 999
-
 def _filter_by_stat_caps(results, current_stats):
   return {
     stat: data for stat, data in results.items()
@@ -39,8 +27,9 @@ def _friend_recreation() -> bool:
         return True
     return False
 
-def _need_recreation(year: str) -> bool:
-  current_mood = state.CURRENT_MOOD_INDEX
+def _need_recreation(turn_state) -> bool:
+  current_mood = turn_state.mood_index
+  year = turn_state.year
   minimum_mood = constants.MOOD_LIST.index(state.MINIMUM_MOOD)
   minimum_mood_with_friend = constants.MOOD_LIST.index(state.MINIMUM_MOOD_WITH_FRIEND)
   minimum_mood_junior_year = constants.MOOD_LIST.index(state.MINIMUM_MOOD_JUNIOR_YEAR)
@@ -58,10 +47,9 @@ def _need_recreation(year: str) -> bool:
   missing_mood =  mood_check - current_mood
   return missing_mood
 
-def _need_infirmary() -> Tuple[Optional[List[str]], int, Optional[object]]:
-  screen = ImageGrab.grab()
-  matches = multi_match_templates(templates, screen=screen)
-  if matches["infirmary"] and is_btn_active(matches["infirmary"][0]) and not _summer_camp(year=state.CURRENT_YEAR):
+def _need_infirmary(year: str) -> Tuple[Optional[List[str]], int, Optional[object]]:
+  matches = multi_match_templates(templates)
+  if matches["infirmary"] and is_btn_active(matches["infirmary"][0]) and not _summer_camp(year=year):
     info("Check for condition.")
     if click(img="assets/buttons/full_stats.png", minSearch=get_secs(1)):
       sleep(0.5)
@@ -72,13 +60,13 @@ def _need_infirmary() -> Tuple[Optional[List[str]], int, Optional[object]]:
         warning("Couldn't find full stats button.")
   return (None, 0, None)
 
-def _summer_next_turn(year: str) -> bool:
+def _summer_next_turn(year: str, turn) -> bool:
     year_parts = year.split(" ")
     if len(year_parts) < 4:
         return False
     if year_parts[0] in ["Classic", "Senior"] and year_parts[3] == "Jun":
         if year_parts[2] == "Early":
-            if state.CURRENT_TURN_LEFT == 1:
+            if turn == 1:
                 return True
             if any("Late Jun" in r.get("date", "") for r in state.RACE_SCHEDULE or []):
                 return True
@@ -94,47 +82,20 @@ def _summer_camp(year: str) -> bool:
         return True
     return False
 
-def ura_training(results: dict):
+@timed("logic.ura_training")
+def ura_training(results: dict, turn_state):
     training_candidates = results
-    energy_level = state.CURRENT_ENERGY_LEVEL
-    year = state.CURRENT_YEAR
-    year_parts = year.split(" ")
-    priority_weight = PRIORITY_WEIGHTS_LIST[state.PRIORITY_WEIGHT]
-
-    for stat_name in training_candidates:
-        if year_parts[0] == "Junior":
-            multiplier = 1
-        else:
-            multiplier = 1 + state.PRIORITY_EFFECTS_LIST[_get_stat_priority(stat_name)] * priority_weight
-        summer_multiplier = 1 + state.SUMMER_PRIORITY_EFFECTS_LIST[_get_stat_priority(stat_name)] * priority_weight
+    energy_level = turn_state.energy
+    year = turn_state.year
 
+    scores = score_trainings(training_candidates, "ura", year, summer=_summer_camp(year), current_stats=turn_state.stats)
+    for i, stat_name in enumerate(scores.stats):
         data = training_candidates[stat_name]
+        data["score_befor_multiplier"] = float(scores.point[i])
+        data["training_score"] = float(scores.score[i])
 
-        # max_friend_support_card = data["friend"]["friendship_levels"]["green"]  
-        friend_value =  data["total_friendship_levels"]["gray"] + data["total_friendship_levels"]["blue"] + data["total_friendship_levels"]["green"]
-        friend_training = data[stat_name]["friendship_levels"]["yellow"] + data[stat_name]["friendship_levels"]["max"]
-
-        if friend_value > 2:
-            friend_value += 0.5 * friend_value
-        if friend_training > 1:
-            friend_training += 0.5 * friend_training
-
-        friend_value_point = 1
-        rainbow_point = 1.5
-
-        score = (friend_value_point * friend_value) + (rainbow_point * friend_training)
-
-        data["score_befor_multiplier"] = score
-
-        if data["total_hints"] > 0:
-            score += state.HINT_POINT
-
-        if _summer_camp(year):
-            data["training_score"] = score * summer_multiplier
-        else:
-            data["training_score"] = score * multiplier
-
-        info(f"[{stat_name.upper()}] -> Non Max Support: {friend_value:.3f}, Rainbow Support: {friend_training}, Hint: {data['total_hints']}")
+        non_maxed, rainbow = scores.contributions[i, 1:3]
+        info(f"[{stat_name.upper()}] -> Non Max Support: {non_maxed:.3f}, Rainbow Support: {rainbow:.3f}, Hint: {data['total_hints']}")
         info(f"[{stat_name.upper()}] -> Score: {data['training_score']:.3f}")
 
     any_nonmaxed = any(
@@ -192,22 +153,24 @@ def ura_training(results: dict):
         info("Only WIT available early; fallback to most-support.")
         return "fallback", None
 
-    best_key, best_data = max(
-        filtered.items(),
-        key=lambda kv: (kv[1]["training_score"], -_get_stat_priority(kv[0])))
-      
+    best_key = best_of(scores, filtered)
+    best_data = filtered[best_key]
+
     info(f"[URA] Training selected: {best_key.upper()} with {best_data['training_score']:.3f} points and {best_data['failure']}% fail chance")
     return best_key, best_data
 
-def ura_logic() -> str:
-    criteria = state.CRITERIA
-    turn = state.CURRENT_TURN_LEFT
-    year = state.CURRENT_YEAR
+@timed("logic.ura_logic")
+def ura_logic(turn_state=None) -> str:
+    if turn_state is None:
+        turn_state = state.TURN_STATE
+    criteria = turn_state.criteria
+    turn = turn_state.turn
+    year = turn_state.year
     year_parts = year.split(" ")
-    energy_level = state.CURRENT_ENERGY_LEVEL
-    max_energy = state.MAX_ENERGY
-    missing_energy = max_energy - energy_level
-    current_stats = state.CURRENT_STATS
+    energy_level = turn_state.energy
+    max_energy = turn_state.max_energy
+    missing_energy = turn_state.missing_energy
+    current_stats = dict(turn_state.stats)
 
     if state.APTITUDES == {}:
         sleep(0.1)
@@ -279,8 +242,8 @@ def ura_logic() -> str:
                 click(img="assets/buttons/back_btn.png", minSearch=get_secs(1), text="Proceeding to training.")
                 sleep(0.5)
 
-    conditions, total_severity, infirmary_box = _need_infirmary()
-    missing_mood = _need_recreation(year)
+    conditions, total_severity, infirmary_box = _need_infirmary(year)
+    missing_mood = _need_recreation(turn_state)
     summer_camp = _summer_camp(year)
 
     go_to_training()
@@ -292,9 +255,9 @@ def ura_logic() -> str:
         info("All stats capped or no valid training")
         return
 
-    result, best_data = ura_training(filtered)
+    result, best_data = ura_training(filtered, turn_state)
 
-    if _summer_next_turn(year):
+    if _summer_next_turn(year, turn):
         if best_data is None and missing_energy < 50:
             info("[URA] Summer camp next & okay energy → Train WIT.")
             sleep(0.5)
@@ -317,7 +280,7 @@ def ura_logic() -> str:
                 do_train("wit")
                 return
             elif best_data["training_score"] < 2:
-                if state.CURRENT_ENERGY_LEVEL <= 50:
+                if energy_level <= 50:
                     state.FORCE_REST = True
                     info("[URA] Summer camp next & low energy → Rest.")
                     do_rest(energy_level)
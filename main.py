@@ -13,6 +13,7 @@ import utils.constants as constants
 from utils.log import info, warning, error, debug
 
 import core.state as state
+from core.recognizer import locate_center
 from server.main import app
 from update_config import update_config
 
@@ -46,7 +47,7 @@ def focus_umamusume():
       pyautogui.press("esc")
       pyautogui.press("f11")
       time.sleep(5)
-      close_btn = pyautogui.locateCenterOnScreen("assets/buttons/bluestacks/close_btn.png", confidence=0.8, minSearchTime=2)
+      close_btn = locate_center("assets/buttons/bluestacks/close_btn.png", confidence=0.8, min_search=2)
       if close_btn:
         pyautogui.click(close_btn)
       return True
@@ -72,6 +73,9 @@ def main():
         from core.EventsDatabase import load_event_databases
         load_event_databases()
 
+        from core.templates import preload_templates
+        preload_templates()
+
         from core.execute import career_lobby
         if focus_umamusume():
             info(f"Config: {state.CONFIG_NAME}")
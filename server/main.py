@@ -7,6 +7,7 @@ import logging
 
 from server.utils import load_config, save_config
 from server.live_log import attach_web_log_handler, get_logs_since, get_latest_id
+from utils import metrics
 
 app = FastAPI()
 
@@ -78,6 +79,10 @@ def api_logs(since: int = Query(-1, description="last seen log id")):
         nxt = get_latest_id()
     return {"next": nxt, "entries": entries}
 
+@app.get("/api/metrics")
+def api_metrics():
+    return metrics.snapshot()
+
 @app.get("/{path:path}")
 async def fallback(path: str):
   file_path = os.path.join(PATH, path)
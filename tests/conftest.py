@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# modules read assets and scraper data relative to the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import utils.constants as constants
+
+@pytest.fixture
+def emulator_layout():
+  """Shift the constants like main.py does for the emulator window, restored afterwards."""
+  saved = dict(vars(constants))
+  constants.adjust_constants_x_coords()
+  yield constants.adjust_constants_x_coords.__defaults__[0]
+  vars(constants).update(saved)
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+import pytest
+
+import core.glyph as glyph
+
+def _strip(text):
+  img = np.full((30, 20 + 16 * len(text), 3), 240, np.uint8)
+  cv2.putText(img, text, (8, 23), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (40, 40, 40), 2, cv2.LINE_AA)
+  return img
+
+@pytest.fixture(autouse=True)
+def glyph_dir(tmp_path, monkeypatch):
+  monkeypatch.setattr(glyph, "GLYPH_DIR", str(tmp_path))
+  monkeypatch.setattr(glyph, "_sets", {})
+  monkeypatch.setattr(glyph, "_pending", {})
+
+def _learn_all():
+  # every digit in at least three different numbers
+  for value in (1023, 1456, 1789, 1230, 1564, 1897, 1302, 1645, 1978, 1320, 1465, 1798):
+    glyph.learn_number(_strip(str(value)), "stat", value)
+
+def test_learned_after_agreeing_reads():
+  _learn_all()
+  assert glyph.read_number(_strip("1007"), "stat") == 1007
+
+def test_single_read_is_not_a_template():
+  glyph.learn_number(_strip("1234"), "stat", 1234)
+  assert glyph._glyphs("stat")[1] is None
+
+def test_misread_does_not_poison():
+  # the OCR fallback reads 1007 as 1001 before any template exists
+  glyph.learn_number(_strip("1007"), "stat", 1001)
+  _learn_all()
+  assert glyph.read_number(_strip("1007"), "stat") == 1007
+  # once the templates exist, a read that contradicts them is not counted
+  assert not glyph.learn_number(_strip("1007"), "stat", 1001)
+  assert glyph.read_number(_strip("1007"), "stat") == 1007
+
+def test_repeated_misread_is_never_learned():
+  for _ in range(5):
+    glyph.learn_number(_strip("1007"), "stat", 1001)
+  glyph.learn_number(_strip("1117"), "stat", 1111)
+  glyph.learn_number(_strip("1077"), "stat", 1011)
+  # 7 was read as 1 three times, but the shape was also labeled 7 once
+  glyph.learn_number(_strip("1777"), "stat", 1777)
+  labels, _ = glyph._glyphs("stat")
+  assert "7" not in labels and labels.count("1") <= glyph.MAX_SAMPLES
+
+def test_out_of_range_is_ignored():
+  assert not glyph.learn_number(_strip("4"), "failure", 400, suffix="%")
+  assert not glyph.learn_number(_strip("77"), "turn", 77)
+
+def test_learning_off():
+  glyph.set_learning(False)
+  try:
+    assert not glyph.learn_number(_strip("1234"), "stat", 1234)
+    assert not glyph._pending.get("stat")
+  finally:
+    glyph.set_learning(True)
@@ -0,0 +1,33 @@
+import cv2
+import numpy as np
+import pytest
+
+from core.recognizer import multi_match_templates, multi_match_shared
+from core.state import SUPPORT_ICONS, SUPPORT_MARKERS
+
+TEMPLATES = {**SUPPORT_ICONS, **SUPPORT_MARKERS}
+
+def _strips():
+  # the support strip of the sample screenshot, and a noisy one with every icon pasted in
+  yield cv2.imread("screenshot.png")[130:700, 845:945].copy()
+  strip = np.random.default_rng(0).integers(60, 200, (570, 100, 3), dtype=np.uint8)
+  for i, path in enumerate(TEMPLATES.values()):
+    icon = cv2.imread(path)
+    strip[10 + i * 60:10 + i * 60 + icon.shape[0], 20:20 + icon.shape[1]] = icon
+  yield strip
+
+@pytest.mark.parametrize("strip", list(_strips()))
+def test_shared_matches_opencv(strip):
+  expected = multi_match_templates(TEMPLATES, strip, 0.8, with_scores=True)
+  shared = multi_match_shared(TEMPLATES, strip, 0.8, with_scores=True)
+  assert expected.keys() == shared.keys()
+  for name in expected:
+    assert [box for box, _ in shared[name]] == [box for box, _ in expected[name]]
+    for (_, a), (_, b) in zip(shared[name], expected[name]):
+      assert a == pytest.approx(b, abs=1e-3)
+
+def test_pasted_icons_found():
+  strip = list(_strips())[1]
+  shared = multi_match_shared(TEMPLATES, strip, 0.8)
+  for i, name in enumerate(TEMPLATES):
+    assert (20, 10 + i * 60) in [box[:2] for box in shared[name]]
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+import pytest
+
+from core.screens import classify_screen, reset_screen_cache
+
+def _frame_with(path, x, y):
+  frame = np.random.default_rng(0).integers(90, 110, (1080, 1920, 3), dtype=np.uint8)
+  img = cv2.imread(path)
+  frame[y:y + img.shape[0], x:x + img.shape[1]] = img
+  return frame
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+  reset_screen_cache()
+  yield
+  reset_screen_cache()
+
+def test_tazuna_steam_layout():
+  name, boxes = classify_screen(_frame_with("assets/ui/tazuna_hint.png", 700, 300))
+  assert name == "tazuna"
+  assert boxes[0][:2] == (700, 300)
+
+def test_tazuna_emulator_layout(emulator_layout):
+  name, boxes = classify_screen(_frame_with("assets/ui/tazuna_hint.png", 700 + emulator_layout, 300))
+  assert name == "tazuna"
+  assert boxes[0][:2] == (700 + emulator_layout, 300)
+
+@pytest.mark.parametrize("shifted", [False, True])
+def test_unity_race_button(request, shifted):
+  from core.state import UNITY_RACE_RULE
+  offset = request.getfixturevalue("emulator_layout") if shifted else 0
+  name, _ = classify_screen(_frame_with("assets/unity_cup/unity_race_btn.png", 800 + offset, 900), UNITY_RACE_RULE)
+  assert name == "unity_race"
@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("pyautogui")
+from core.skill import _scroll_shift, plan_purchases, skill_priorities
+
+def _long_list(height=3000, width=875):
+  # rows of shaded cards with dark text-like strokes, like the skill list
+  rng = np.random.default_rng(1)
+  img = np.full((height, width, 3), 235, np.uint8)
+  for y in range(0, height, 110):
+    img[y + 5:y + 100, 20:width - 20] = rng.integers(150, 220, 3)
+    for k in range(8):
+      x = int(rng.integers(40, width - 200))
+      img[y + 20 + k * 8:y + 26 + k * 8, x:x + int(rng.integers(40, 150))] = 30
+  return img
+
+@pytest.mark.parametrize("shift", [0, 100, 340, 400, 450, 600, -450])
+def test_scroll_shift(shift):
+  img = _long_list()
+  top = 1000
+  prev = img[top:top + 800]
+  curr = img[top + shift:top + shift + 800]
+  assert _scroll_shift(prev, curr) == shift
+
+def test_scroll_shift_lost():
+  img = _long_list()
+  assert _scroll_shift(img[0:800], img[2000:2800]) is None
+
+def _rows(costs, priorities):
+  return {name: {"name": name, "cost": cost, "value": priorities[name]} for name, cost in costs.items()}
+
+def test_top_priority_beats_lower_ones():
+  priorities = skill_priorities(["Concentration", "Corner Recovery ○", "Straightaway Recovery"])
+  rows = _rows({"Concentration": 200, "Corner Recovery ○": 100, "Straightaway Recovery": 100}, priorities)
+  assert plan_purchases(rows, 200) == {"Concentration"}
+  assert plan_purchases(rows, 400) == set(rows)
+
+def test_fills_the_rest_of_the_budget():
+  priorities = skill_priorities(["Concentration", "Corner Recovery ○", "Straightaway Recovery"])
+  rows = _rows({"Concentration": 300, "Corner Recovery ○": 250, "Straightaway Recovery": 100}, priorities)
+  assert plan_purchases(rows, 400) == {"Concentration", "Straightaway Recovery"}
+
+def test_unread_cost_is_left_out():
+  priorities = skill_priorities(["Concentration", "Corner Recovery ○"])
+  rows = _rows({"Concentration": -1, "Corner Recovery ○": 100}, priorities)
+  assert plan_purchases(rows, 500) == {"Corner Recovery ○"}
@@ -11,6 +11,7 @@ SCREEN_HEADER_REGION=(125, 0, 1000-125, 140)
 RACE_INFO_TEXT_REGION=(285, 335, 810-285, 370-335)
 RACE_NAME_TEXT_REGION=(350, 25, 780-350, 55-25)
 RACE_LIST_BOX_REGION=(260, 580, 850-265, 870-580)
+SKILL_LIST_REGION=(125, 160, 1000-125, 960-160)
 
 AFTER_RACE_FANS_REGION=(410,535,800-410,575-535)
 FANS_REGION=(540,680,830-540,715-680)
@@ -27,6 +28,7 @@ WIT_STAT_REGION = (690, 723, 55, 20)
 
 SCROLLING_SELECTION_MOUSE_POS=(560, 680)
 SKILL_SCROLL_BOTTOM_MOUSE_POS=(560, 850)
+SKILL_SCROLL_TOP_MOUSE_POS=(560, 400)
 RACE_SCROLL_BOTTOM_MOUSE_POS=(560, 850)
 RACE_SCROLL_TOP_MOUSE_POS=(560, 580)
 
@@ -38,6 +40,8 @@ SUPPORT_CARD_ICON_BBOX=(845, 130, 945, 700)
 ENERGY_BBOX=(440, 120, 800, 160)
 RACE_BUTTON_IN_RACE_BBOX_LANDSCAPE=(800, 950, 1150, 1050)
 GAME_SCREEN=(150, 0, 960 - 150, 1080)
+# same area, the _REGION name gets it shifted with the emulator layout
+GAME_SCREEN_REGION=(150, 0, 960 - 150, 1080)
 CLAW_EVENT_REGION=(740, 20, 190, 50)
 
 UNITY_ROUND_REGION = (450, 290, 660 - 450, 330 - 290)
@@ -0,0 +1,117 @@
+# timing spans aggregated per turn and per career
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+# histogram bucket upper bounds in milliseconds, the last bucket takes everything above
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+_lock = threading.Lock()
+_turn = {}
+_career = {}
+_last_turn = None
+_turns = 0
+
+# own logger so metrics lines don't end up in log.txt or the web log
+_logger = logging.getLogger("metrics")
+_logger.propagate = False
+_logger.setLevel(logging.INFO)
+# logs/metrics.jsonl is opened on the first record, importing this module creates no files
+_handler = None
+
+def _sink():
+  global _handler
+  if _handler is None:
+    log_dir = os.path.join(os.getcwd(), "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    _handler = RotatingFileHandler(
+      os.path.join(log_dir, "metrics.jsonl"),
+      maxBytes=1_000_000,
+      backupCount=5,
+      encoding="utf-8"
+    )
+    _logger.addHandler(_handler)
+  return _logger
+
+def _new_histogram():
+  return {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(BUCKETS_MS) + 1)}
+
+def _add(histograms, name, ms):
+  hist = histograms.get(name)
+  if hist is None:
+    hist = histograms[name] = _new_histogram()
+  hist["count"] += 1
+  hist["total_ms"] += ms
+  hist["max_ms"] = max(hist["max_ms"], ms)
+  hist["buckets"][bisect_left(BUCKETS_MS, ms)] += 1
+
+def _merge(into, histograms):
+  for name, hist in histograms.items():
+    total = into.get(name)
+    if total is None:
+      total = into[name] = _new_histogram()
+    total["count"] += hist["count"]
+    total["total_ms"] += hist["total_ms"]
+    total["max_ms"] = max(total["max_ms"], hist["max_ms"])
+    total["buckets"] = [a + b for a, b in zip(total["buckets"], hist["buckets"])]
+
+def record(name, seconds):
+  ms = seconds * 1000
+  with _lock:
+    _add(_turn, name, ms)
+
+@contextmanager
+def span(name):
+  """Time the with-block under name. Spans nest, so the times are inclusive."""
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    record(name, time.perf_counter() - start)
+
+def timed(name):
+  """Decorator version of span."""
+  def decorator(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+      start = time.perf_counter()
+      try:
+        return func(*args, **kwargs)
+      finally:
+        record(name, time.perf_counter() - start)
+    return wrapper
+  return decorator
+
+def end_turn(label=None):
+  """Close the current turn: write its histograms to logs/metrics.jsonl and add them to the career."""
+  global _turn, _last_turn, _turns
+  with _lock:
+    turn, _turn = _turn, {}
+    if not turn:
+      return
+    _turns += 1
+    _merge(_career, turn)
+    _last_turn = {"turn": label, "index": _turns, "time": time.time(), "spans": turn}
+    line = json.dumps(_last_turn)
+  _sink().info(line)
+
+def reset_career():
+  global _turn, _career, _last_turn, _turns
+  with _lock:
+    _turn, _career, _last_turn, _turns = {}, {}, None, 0
+
+def snapshot():
+  with _lock:
+    return {
+      "buckets_ms": list(BUCKETS_MS),
+      "turns": _turns,
+      "current_turn": json.loads(json.dumps(_turn)),
+      "last_turn": json.loads(json.dumps(_last_turn)),
+      "career": json.loads(json.dumps(_career)),
+    }
@@ -1,13 +1,19 @@
 from turtle import width
 import pyautogui
 import re
+from concurrent.futures import ThreadPoolExecutor
 import core.state as state
 import utils.constants as constants
 
-from utils.tools import sleep, drag_scroll, get_secs, click, wait_for_image
+from utils.tools import sleep, drag_scroll, get_secs, click, wait_for_image, wait_for_screen, wait_for_stable
 from utils.log import info, warning, error, debug
+from utils.metrics import timed
+from utils.recorder import record
+from utils.screenshot import grab_frame, refresh_frame, release_frame
 from core.state import check_support_card, check_failure, check_skill_pts, get_race_type, get_event_name, stop_bot, check_debut_status, get_race_name, check_fans, check_fans_after_race
-from core.recognizer import is_btn_active
+from core.recognizer import is_btn_active, locate, locate_center, match_template
+from core.race_icons import find_banners, scroll_distance
+import core.race_calendar as race_calendar
 from core.skill import buy_skill
 from core.events import get_optimal_choice
 
@@ -21,20 +27,29 @@ training_types = {
   "wit": "assets/icons/train_wit.png"
 }
 
+# training previews are analysed here while the cursor moves on to the next button
+_training_pool = ThreadPoolExecutor(max_workers=len(training_types), thread_name_prefix="training")
+
 def go_to_training():
   return click("assets/buttons/training_btn.png")
 
+def analyze_training(frame):
+    support_card_results = check_support_card(frame=frame)
+    support_card_results["failure"] = check_failure(frame=frame)
+    return support_card_results
+
+@timed("process.check_training")
 def check_training():
     if state.stop_event.is_set():
         return {}
 
-    results = {}
+    pending = {}
 
     for key, icon_path in training_types.items():
         if state.stop_event.is_set():
             return {}
 
-        pos = pyautogui.locateOnScreen(icon_path, confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
+        pos = locate(icon_path, confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
         if pos:
             if not is_btn_active(pos, treshold=120):
                 state.TRAINING_RESTRICTED = True
@@ -45,30 +60,36 @@ def check_training():
             cy = pos.top + pos.height // 2
             pyautogui.moveTo(cx, cy, duration=0.1)
             pyautogui.mouseDown()
-
-            support_card_results = check_support_card()
-            failure_chance = check_failure()
-            support_card_results["failure"] = failure_chance
-            results[key] = support_card_results
-
-            debug(
-                f"[{key.upper()}] → Total Supports: {support_card_results['total_supports']}, "
-                f"Total Non-Maxed Supports: {support_card_results['total_non_maxed_support']}, "
-                f"Levels:{support_card_results['total_friendship_levels']}, "
-                f"Fail: {failure_chance}%, Hint: {support_card_results['total_hints']}"
-            )
             sleep(0.1)
 
-    back = pyautogui.locateOnScreen("assets/buttons/back_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
+            # one capture of the hovered preview, analysed in the background
+            frame = grab_frame()
+            pending[key] = (frame, _training_pool.submit(analyze_training, frame))
+
+    release_frame()
+    back = locate("assets/buttons/back_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
     pyautogui.moveTo(back, duration=0.2)
     pyautogui.mouseUp()
     click(img="assets/buttons/back_btn.png")
+
+    results = {}
+    for key, (frame, future) in pending.items():
+        support_card_results = future.result()
+        results[key] = support_card_results
+        record("training", frame, {"training": key, **support_card_results})
+
+        debug(
+            f"[{key.upper()}] → Total Supports: {support_card_results['total_supports']}, "
+            f"Total Non-Maxed Supports: {support_card_results['total_non_maxed_support']}, "
+            f"Levels:{support_card_results['total_friendship_levels']}, "
+            f"Fail: {support_card_results['failure']}%, Hint: {support_card_results['total_hints']}"
+        )
     return results
 
 def do_train(train):
   if state.stop_event.is_set():
     return
-  train_btn = pyautogui.locateOnScreen(f"assets/icons/train_{train}.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
+  train_btn = locate(f"assets/icons/train_{train}.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
   if train_btn:
     click(boxes=train_btn, click=3)
 
@@ -79,8 +100,8 @@ def do_rest(energy_level):
     if state.NEVER_REST_ENERGY > 0 and energy_level > state.NEVER_REST_ENERGY:
       info(f"Wanted to rest when energy was above {state.NEVER_REST_ENERGY}, retrying from beginning.")
       return
-  rest_btn = pyautogui.locateOnScreen("assets/buttons/rest_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
-  rest_summber_btn = pyautogui.locateOnScreen("assets/buttons/rest_summer_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
+  rest_btn = locate("assets/buttons/rest_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
+  rest_summber_btn = locate("assets/buttons/rest_summer_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
 
   if rest_btn:
     click(boxes=rest_btn)
@@ -90,18 +111,20 @@ def do_rest(energy_level):
 def do_recreation(method = None):
   if state.stop_event.is_set():
     return
-  recreation_btn = pyautogui.locateOnScreen("assets/buttons/recreation_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
-  recreation_summer_btn = pyautogui.locateOnScreen("assets/buttons/rest_summer_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
+  recreation_btn = locate("assets/buttons/recreation_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
+  recreation_summer_btn = locate("assets/buttons/rest_summer_btn.png", confidence=0.8, region=constants.SCREEN_BOTTOM_REGION)
 
   if recreation_btn:
     click(boxes=recreation_btn)
     sleep(0.1)
-    
-    aoi_event = pyautogui.locateCenterOnScreen("assets/ui/aoi_event.png", confidence=0.8, region=constants.GAME_SCREEN)
-    tazuna_event = pyautogui.locateCenterOnScreen("assets/ui/tazuna_event.png", confidence=0.8, region=constants.GAME_SCREEN)
-    riko_event = pyautogui.locateCenterOnScreen("assets/ui/riko_event.png", confidence=0.8, region=constants.GAME_SCREEN)
-    date_complete = pyautogui.locateCenterOnScreen("assets/ui/date_complete.png", confidence=0.8, region=constants.GAME_SCREEN)
-    trainee_recreation = pyautogui.locateCenterOnScreen("assets/icons/trainee_recreation.png", confidence=0.8, region=constants.GAME_SCREEN)
+    # all five lookups below read the same capture
+    refresh_frame()
+
+    aoi_event = locate_center("assets/ui/aoi_event.png", confidence=0.8, region=constants.GAME_SCREEN)
+    tazuna_event = locate_center("assets/ui/tazuna_event.png", confidence=0.8, region=constants.GAME_SCREEN)
+    riko_event = locate_center("assets/ui/riko_event.png", confidence=0.8, region=constants.GAME_SCREEN)
+    date_complete = locate_center("assets/ui/date_complete.png", confidence=0.8, region=constants.GAME_SCREEN)
+    trainee_recreation = locate_center("assets/icons/trainee_recreation.png", confidence=0.8, region=constants.GAME_SCREEN)
 
     if method == "friend":
       if date_complete:
@@ -119,6 +142,8 @@ def do_recreation(method = None):
     else:
         pyautogui.moveTo(trainee_recreation, duration=0.15)
         pyautogui.click(trainee_recreation)
+    # clicked past the tools helpers, drop the capture taken before the click
+    release_frame()
 
   elif recreation_summer_btn:
     click(boxes=recreation_summer_btn)
@@ -128,7 +153,7 @@ def do_race(found_race = False, img = None):
     return False
   click(img="assets/buttons/races_btn.png", minSearch=get_secs(10))
 
-  consecutive_cancel_btn = pyautogui.locateCenterOnScreen("assets/buttons/cancel_btn.png", minSearchTime=get_secs(0.7), confidence=0.8)
+  consecutive_cancel_btn = locate_center("assets/buttons/cancel_btn.png", min_search=get_secs(0.7), confidence=0.8)
   if state.CANCEL_CONSECUTIVE_RACE and consecutive_cancel_btn:
     click(img="assets/buttons/cancel_btn.png", text="[INFO] Already raced 3+ times consecutively. Cancelling race and doing training.")
     return False
@@ -145,7 +170,7 @@ def do_race(found_race = False, img = None):
     return False
 
   race_prep()
-  sleep(1)
+  wait_for_stable(constants.SCREEN_BOTTOM_REGION)
   after_race()
   return True
 
@@ -168,9 +193,22 @@ def race_day():
     sleep(0.5)
 
   race_prep()
-  sleep(1)
+  wait_for_stable(constants.SCREEN_BOTTOM_REGION)
   after_race()
 
+# the list box only takes drags this long, longer scrolls are split
+RACE_LIST_MAX_DRAG = 270
+
+def _scroll_race_list(distance):
+    """Move the race list content up by distance pixels, down if negative."""
+    while abs(distance) >= 1 and not state.stop_event.is_set():
+        step = max(-RACE_LIST_MAX_DRAG, min(RACE_LIST_MAX_DRAG, distance))
+        if step > 0:
+            drag_scroll(constants.RACE_SCROLL_BOTTOM_MOUSE_POS, -step)
+        else:
+            drag_scroll(constants.RACE_SCROLL_TOP_MOUSE_POS, -step)
+        distance -= step
+
 def race_select(found_race=False, img=None):
     if state.stop_event.is_set():
         return False
@@ -184,19 +222,34 @@ def race_select(found_race=False, img=None):
 
     if found_race and img:
         info(f"Looking for {img}.")
+        left, top, width, height = constants.RACE_LIST_BOX_REGION
+        list_bbox = (left, top, left + width, top + height)
+        # races of this turn in races.json order, narrows down what a banner can be
+        order = [r["name"] for r in race_calendar.races_at(state.VIRTUAL_TURN)]
+        previous = None
         for _ in range(6):
             if state.stop_event.is_set():
                 return False
-            if click(img=f"assets/races_icon/{img}.png",
-                     minSearch=get_secs(0.7),
-                     text=f"{img} found.",
-                     region=constants.RACE_LIST_BOX_REGION):
+            wait_for_stable(constants.RACE_LIST_BOX_REGION, timeout=0.7)
+            frame = refresh_frame()
+            boxes = match_template(f"assets/races_icon/{img}.png", list_bbox, threshold=0.8, frame=frame)
+            if boxes:
+                x, y, w, h = boxes[0]
+                click(boxes=(x + left, y + top, w, h), text=f"{img} found.")
                 for _ in range(2):
                     if not click(img="assets/buttons/race_btn.png", minSearch=get_secs(2)):
                         click(img="assets/buttons/bluestacks/race_btn.png", minSearch=get_secs(2))
                     sleep(0.5)
                 return True
-            drag_scroll(constants.RACE_SCROLL_BOTTOM_MOUSE_POS, -270)
+
+            # not in view: tell which races are, and scroll straight to where the target should be
+            banners = find_banners(constants.RACE_LIST_BOX_REGION, frame, order)
+            names = [b.name for b in banners]
+            if names == previous and any(names):
+                debug("Race list didn't move, reached its end.")
+                break
+            previous = names
+            _scroll_race_list(scroll_distance(banners, img, order, constants.RACE_LIST_BOX_REGION))
 
         return False
     else:
@@ -204,7 +257,7 @@ def race_select(found_race=False, img=None):
         for i in range(4):
           if state.stop_event.is_set():
             return False
-          match_aptitude = pyautogui.locateOnScreen("assets/ui/match_track.png", confidence=0.8, minSearchTime=get_secs(0.7))
+          match_aptitude = locate("assets/ui/match_track.png", confidence=0.8, min_search=get_secs(0.7))
 
           if match_aptitude:
             # locked avg brightness = 163
@@ -252,9 +305,9 @@ def race_prep():
   elif state.POSITION_SELECTION_ENABLED:
     # these two are mutually exclusive, so we only use preferred position if positions by race is not enabled.
     if state.ENABLE_POSITIONS_BY_RACE:
-      sleep(0.5)
+      wait_for_stable(constants.SCREEN_HEADER_REGION)
       click(img="assets/buttons/info_btn.png", minSearch=get_secs(10), region=constants.SCREEN_HEADER_REGION)
-      sleep(0.5)
+      wait_for_stable(constants.RACE_INFO_TEXT_REGION)
       #find race text, get part inside parentheses using regex, strip whitespaces and make it lowercase for our usage
       race_info_text = get_race_type()
       match_race_type = re.search(r"\(([^)]+)\)", race_info_text)
@@ -284,22 +337,23 @@ def race_prep():
     pyautogui.tripleClick(interval=0.2)
     sleep(0.5)
   pyautogui.click()
-  next_button = pyautogui.locateCenterOnScreen("assets/buttons/next_btn.png", confidence=0.9, minSearchTime=get_secs(4), region=constants.SCREEN_BOTTOM_REGION)
+  release_frame()
+  next_button = locate_center("assets/buttons/next_btn.png", confidence=0.9, min_search=get_secs(4), region=constants.SCREEN_BOTTOM_REGION)
   if not next_button:
     info(f"Wouldn't be able to move onto the after race since there's no next button.")
     if click("assets/buttons/race_btn.png", confidence=0.8, minSearch=get_secs(10), region=constants.SCREEN_BOTTOM_REGION):
-      info(f"Went into the race, sleep for {get_secs(10)} seconds to allow loading.")
-      sleep(10)
+      _, waited = wait_for_screen("assets/buttons/race_exclamation_btn.png", timeout=10)
+      info(f"Went into the race, loading took {waited:.1f} seconds.")
       if not click("assets/buttons/race_exclamation_btn.png", confidence=0.8, minSearch=get_secs(10)):
         info("Couldn't find \"Race!\" button, looking for alternative version.")
         click("assets/buttons/race_exclamation_btn_portrait.png", confidence=0.8, minSearch=get_secs(10))
       sleep(0.5)
-      skip_btn = pyautogui.locateOnScreen("assets/buttons/skip_btn.png", confidence=0.8, minSearchTime=get_secs(2), region=constants.SCREEN_BOTTOM_REGION)
-      skip_btn_big = pyautogui.locateOnScreen("assets/buttons/skip_btn_big.png", confidence=0.8, minSearchTime=get_secs(2), region=constants.SKIP_BTN_BIG_REGION_LANDSCAPE)
+      skip_btn = locate("assets/buttons/skip_btn.png", confidence=0.8, min_search=get_secs(2), region=constants.SCREEN_BOTTOM_REGION)
+      skip_btn_big = locate("assets/buttons/skip_btn_big.png", confidence=0.8, min_search=get_secs(2), region=constants.SKIP_BTN_BIG_REGION_LANDSCAPE)
       if not skip_btn_big and not skip_btn:
         warning("Coulnd't find skip buttons at first search.")
-        skip_btn = pyautogui.locateOnScreen("assets/buttons/skip_btn.png", confidence=0.8, minSearchTime=get_secs(10), region=constants.SCREEN_BOTTOM_REGION)
-        skip_btn_big = pyautogui.locateOnScreen("assets/buttons/skip_btn_big.png", confidence=0.8, minSearchTime=get_secs(10), region=constants.SKIP_BTN_BIG_REGION_LANDSCAPE)
+        skip_btn = locate("assets/buttons/skip_btn.png", confidence=0.8, min_search=get_secs(10), region=constants.SCREEN_BOTTOM_REGION)
+        skip_btn_big = locate("assets/buttons/skip_btn_big.png", confidence=0.8, min_search=get_secs(10), region=constants.SKIP_BTN_BIG_REGION_LANDSCAPE)
       if skip_btn:
         click(boxes=skip_btn, click=3)
       if skip_btn_big:
@@ -315,10 +369,10 @@ def race_prep():
       if skip_btn_big:
         click(boxes=skip_btn_big, click=3)
       sleep(3)
-      skip_btn = pyautogui.locateOnScreen("assets/buttons/skip_btn.png", confidence=0.8, minSearchTime=get_secs(5), region=constants.SCREEN_BOTTOM_REGION)
+      skip_btn = locate("assets/buttons/skip_btn.png", confidence=0.8, min_search=get_secs(5), region=constants.SCREEN_BOTTOM_REGION)
       click(boxes=skip_btn, click=3)
       #since we didn't get the trophy before, if we get it we close the trophy
-      close_btn = pyautogui.locateOnScreen("assets/buttons/close_btn.png", confidence=0.8, minSearchTime=get_secs(5))
+      close_btn = locate("assets/buttons/close_btn.png", confidence=0.8, min_search=get_secs(5))
       click(boxes=close_btn, click=3)
       info("Finished race skipping job.")
 
@@ -326,8 +380,7 @@ def after_race():
   if state.stop_event.is_set():
     return
   click(img="assets/buttons/next_btn.png", minSearch=get_secs(5))
-  sleep(0.3)
-  
+
   ok, box = wait_for_image(
     "assets/ui/fans_label.png",
      timeout=10,
@@ -343,33 +396,34 @@ def after_race():
   check_fans_after_race(region=fan_region)
 
   pyautogui.click()
+  release_frame()
   click(img="assets/buttons/next2_btn.png", minSearch=get_secs(5))
 
 def auto_buy_skill():
   if state.stop_event.is_set():
     return
-  if check_skill_pts() < state.SKILL_PTS_CHECK:
+  skill_pts = check_skill_pts()
+  if skill_pts < state.SKILL_PTS_CHECK:
     return
 
   click(img="assets/buttons/skills_btn.png")
   info("Buying skills")
-  sleep(0.5)
+  wait_for_stable(constants.SCREEN_MIDDLE_REGION)
 
-  if buy_skill():
-    pyautogui.locateCenterOnScreen("assets/buttons/confirm_btn.png")
+  if buy_skill(budget=skill_pts):
     click(img="assets/buttons/confirm_btn.png", minSearch=get_secs(1), region=constants.SCREEN_BOTTOM_REGION)
-    sleep(0.5)
+    wait_for_stable(constants.SCREEN_BOTTOM_REGION)
     click(img="assets/buttons/learn_btn.png", minSearch=get_secs(1), region=constants.SCREEN_BOTTOM_REGION)
-    sleep(0.5)
+    wait_for_stable(constants.SCREEN_MIDDLE_REGION)
     click(img="assets/buttons/close_btn.png", minSearch=get_secs(2), region=constants.SCREEN_MIDDLE_REGION)
-    sleep(0.5)
+    wait_for_stable(constants.SCREEN_BOTTOM_REGION)
     click(img="assets/buttons/back_btn.png")
   else:
     info("No matching skills found. Going back.")
     click(img="assets/buttons/back_btn.png")
 
 def event_choice():
-  event_choice_1 = pyautogui.locateOnScreen("assets/icons/event_choice_1.png", confidence=0.9, minSearchTime=0.2, region=constants.GAME_SCREEN)
+  event_choice_1 = locate("assets/icons/event_choice_1.png", confidence=0.9, min_search=0.2, region=constants.GAME_SCREEN)
   choice_vertical_gap = 112
 
   if not event_choice_1:
@@ -401,15 +455,15 @@ def check_fan():
         fan_check_region = constants.SCREEN_TOP_REGION
 
     if click("assets/buttons/info_btn.png", region=fan_check_region, confidence=0.9):
-    sleep(0.5)
-    check_debut_status()
-    check_fans()
-    sleep(0.5)
-    click("assets/buttons/close_btn.png")
+        sleep(0.5)
+        check_debut_status()
+        check_fans()
+        sleep(0.5)
+        click("assets/buttons/close_btn.png")
     else:
         debug("info button not found")
 
 def race_process():
     race_prep()
-    sleep(1)
+    wait_for_stable(constants.SCREEN_BOTTOM_REGION)
     after_race()
\ No newline at end of file
@@ -0,0 +1,54 @@
+# dumps the frames the bot acted on together with what it recognized, for utils/replay.py
+import json
+import os
+import threading
+import time
+import cv2
+
+from utils.log import info, warning, error, debug
+
+_lock = threading.Lock()
+_dir = None
+_count = 0
+
+def start_recording(directory):
+  """Start a new recording session in directory/<timestamp>."""
+  global _dir, _count
+  session = os.path.join(directory, time.strftime("%Y%m%d-%H%M%S"))
+  os.makedirs(os.path.join(session, "frames"), exist_ok=True)
+  with _lock:
+    _dir = session
+    _count = 0
+  info(f"Recording frames to {session}")
+  return session
+
+def stop_recording():
+  global _dir
+  with _lock:
+    _dir = None
+
+def is_recording():
+  return _dir is not None
+
+def record(kind, frame, recognized):
+  """
+  Save frame as a PNG and append a line to ticks.jsonl.
+  kind: "lobby" or "training", tells the replay which readers to run.
+  recognized: JSON-serializable dict of what the bot read from the frame.
+  """
+  global _count
+  if _dir is None or frame is None:
+    return
+  with _lock:
+    if _dir is None:
+      return
+    index = _count
+    _count += 1
+    session = _dir
+
+  file = f"{index:05d}_{kind}.png"
+  cv2.imwrite(os.path.join(session, "frames", file), frame)
+  line = {"index": index, "kind": kind, "frame": file, "time": time.time(), "recognized": recognized}
+  with _lock:
+    with open(os.path.join(session, "ticks.jsonl"), "a", encoding="utf-8") as f:
+      f.write(json.dumps(line, default=str) + "\n")
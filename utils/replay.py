@@ -0,0 +1,174 @@
+# Replays a recording made with "record" enabled in config.json and reports latency
+# and accuracy per recognizer, no game window needed.
+#
+#   python -m utils.replay recordings/20250101-120000 [--repeat 3] [--json out.json] [--baseline]
+#
+# Accuracy is measured against "expected" in ticks.jsonl when a line has one
+# (hand-corrected values), otherwise against what the bot recognized live.
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import cv2
+
+import core.state as state
+from core.glyph import set_learning
+from utils.screenshot import set_frame_source, refresh_frame, release_frame
+
+# state globals the readers write, reset before every run so passes don't depend on each other
+READER_STATE = ("LAST_VALID_STATS",)
+
+def _turn_fields(turn_state):
+  return {
+    "energy": [turn_state.energy, turn_state.max_energy],
+    "mood": turn_state.mood,
+    "turn": turn_state.turn,
+    "year": turn_state.year,
+    "criteria": turn_state.criteria,
+    "stats": dict(turn_state.stats),
+  }
+
+def _lobby_readers(baseline=False):
+  # career_lobby reads the lobby through read_turn_state, that's the path timed and scored
+  readers = {"turn_state": lambda frame: _turn_fields(state.read_turn_state())}
+  if baseline:
+    # the per-field checks the batched read replaced, only to compare against
+    readers.update({
+      "energy_single": lambda frame: list(state.check_energy_level()),
+      "mood_single": lambda frame: state.check_mood(),
+      "turn_single": lambda frame: state.check_turn(),
+      "year_single": lambda frame: state.check_current_year(),
+      "criteria_single": lambda frame: state.check_criteria(),
+      "stats_single": lambda frame: state.check_stats(),
+    })
+  return readers
+
+def _training_readers():
+  return {
+    "failure": lambda frame: state.check_failure(frame=frame),
+    "supports": lambda frame: _support_summary(state.check_support_card(frame=frame)),
+  }
+
+def _support_summary(result):
+  return {
+    "total_supports": result["total_supports"],
+    "total_hints": result["total_hints"],
+    "total_friendship_levels": result["total_friendship_levels"],
+  }
+
+# recognizer -> how to pull its expected value out of a recorded line
+EXPECTED = {
+  "energy": lambda r: [r.get("energy"), r.get("max_energy")],
+  "mood": lambda r: r.get("mood"),
+  "turn": lambda r: r.get("turn"),
+  "year": lambda r: r.get("year"),
+  "criteria": lambda r: r.get("criteria"),
+  "stats": lambda r: r.get("stats"),
+  "failure": lambda r: r.get("failure"),
+  "supports": lambda r: _support_summary(r) if "total_supports" in r else None,
+}
+
+def _same(a, b):
+  # compare through JSON so tuples/lists and int/str dict keys line up with the recording
+  return json.loads(json.dumps(a, default=str)) == json.loads(json.dumps(b, default=str))
+
+def _restore(saved):
+  for name, value in saved.items():
+    setattr(state, name, value)
+
+def load_ticks(session):
+  with open(os.path.join(session, "ticks.jsonl"), encoding="utf-8") as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+def _score(entry, value, want):
+  if want is not None:
+    entry["total"] += 1
+    entry["hits"] += _same(value, want)
+
+def replay(session, repeat=1, baseline=False):
+  """
+  Run every reader over every recorded frame, returns {recognizer: {"ms": [...], "hits": n, "total": n}}.
+  The fields of turn_state are also scored one by one, those entries have no timings.
+  baseline: also run the per-field lobby checks, as "<field>_single".
+  """
+  state.reload_config()
+  report = {}
+  current = {"frame": None}
+  saved = {name: getattr(state, name) for name in READER_STATE}
+  set_frame_source(lambda: current["frame"])
+  # glyph templates stay as they are, otherwise the first pass reads through OCR and the next ones don't
+  set_learning(False)
+  try:
+    for tick in load_ticks(session):
+      frame = cv2.imread(os.path.join(session, "frames", tick["frame"]))
+      if frame is None:
+        continue
+      current["frame"] = frame
+      readers = _lobby_readers(baseline) if tick["kind"] == "lobby" else _training_readers()
+      expected = tick.get("expected") or tick["recognized"]
+
+      for name, reader in readers.items():
+        entry = report.setdefault(name, {"ms": [], "hits": 0, "total": 0})
+        for _ in range(repeat):
+          _restore(saved)
+          refresh_frame()
+          start = time.perf_counter()
+          value = reader(frame)
+          entry["ms"].append((time.perf_counter() - start) * 1000)
+        if name != "turn_state":
+          _score(entry, value, EXPECTED[name.removesuffix("_single")](expected))
+          continue
+        # the whole read counts as a hit only when every recorded field matched
+        recorded = {}
+        for field, field_value in value.items():
+          want = EXPECTED[field](expected)
+          _score(report.setdefault(field, {"ms": [], "hits": 0, "total": 0}), field_value, want)
+          if want is not None:
+            recorded[field] = want
+        _score(entry, {field: value[field] for field in recorded}, recorded or None)
+  finally:
+    _restore(saved)
+    set_learning(True)
+    release_frame()
+    set_frame_source(None)
+  return report
+
+def summarize(report):
+  rows = {}
+  for name, entry in report.items():
+    ms = sorted(entry["ms"])
+    if not ms and not entry["total"]:
+      continue
+    rows[name] = {
+      "runs": len(ms),
+      "mean_ms": statistics.fmean(ms) if ms else None,
+      "p50_ms": ms[len(ms) // 2] if ms else None,
+      "p95_ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))] if ms else None,
+      "accuracy": entry["hits"] / entry["total"] if entry["total"] else None,
+    }
+  return rows
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Replay a recorded session and benchmark the recognizers.")
+  parser.add_argument("session", help="recording folder containing ticks.jsonl and frames/")
+  parser.add_argument("--repeat", type=int, default=1, help="runs per frame and recognizer")
+  parser.add_argument("--json", help="also write the summary to this file")
+  parser.add_argument("--baseline", action="store_true", help="also run the per-field lobby checks to compare against")
+  args = parser.parse_args(argv)
+
+  rows = summarize(replay(args.session, args.repeat, args.baseline))
+  print(f"{'recognizer':<16}{'runs':>6}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'accuracy':>10}")
+  for name, row in rows.items():
+    accuracy = f"{row['accuracy']:.1%}" if row["accuracy"] is not None else "-"
+    timings = "".join(f"{row[col]:>10.1f}" if row[col] is not None else f"{'-':>10}" for col in ("mean_ms", "p50_ms", "p95_ms"))
+    print(f"{name:<16}{row['runs']:>6}{timings}{accuracy:>10}")
+
+  if args.json:
+    with open(args.json, "w", encoding="utf-8") as f:
+      json.dump(rows, f, indent=2)
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
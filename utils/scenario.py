@@ -1,12 +1,7 @@
-import pyautogui
-from utils.tools import get_secs
+from utils.tools import get_secs, click
 
 def ura():
-  race_btn = pyautogui.locateCenterOnScreen("assets/ura/ura_race_btn.png", confidence=0.8, minSearchTime=get_secs(5))
-  if race_btn:
-    pyautogui.click(race_btn)
+  click(img="assets/ura/ura_race_btn.png", minSearch=get_secs(5))
 
 def unity():
-  race_btn = pyautogui.locateCenterOnScreen("assets/unity_cup/unity_race_btn.png", confidence=0.8, minSearchTime=get_secs(5))
-  if race_btn:
-    pyautogui.click(race_btn)
\ No newline at end of file
+  click(img="assets/unity_cup/unity_race_btn.png", minSearch=get_secs(5))
@@ -1,20 +1,98 @@
 from PIL import Image, ImageEnhance
+import threading
 import mss
 import numpy as np
 import cv2
 
-def enhanced_screenshot(region=(0, 0, 1920, 1080)) -> Image.Image:
-  with mss.mss() as sct:
+from utils.metrics import timed
+
+# Frame shared by every reader during one bot tick (BGR, full screen).
+# Readers crop views out of it instead of grabbing the screen again,
+# anything that changes the UI (click, scroll, sleep) releases it.
+_frame = None
+_local = threading.local()
+# callable returning a full BGR frame, replaces the live screen (replays, benchmarks)
+_frame_source = None
+
+def set_frame_source(source=None):
+  """Read frames from source() instead of the screen, None goes back to the live screen."""
+  global _frame_source
+  _frame_source = source
+  release_frame()
+
+def _sct():
+  # mss handles are not thread-safe, keep one per thread and reuse it
+  sct = getattr(_local, "sct", None)
+  if sct is None:
+    sct = mss.mss()
+    _local.sct = sct
+  return sct
+
+@timed("screenshot.grab")
+def grab_frame(region=None) -> np.ndarray:
+  """
+  Grab the screen as a BGR array.
+  region: (left, top, width, height), full primary monitor if None.
+  """
+  if _frame_source is not None:
+    frame = _frame_source()
+    if region is None:
+      return frame
+    x, y, w, h = (int(v) for v in region)
+    return frame[max(y, 0):y + h, max(x, 0):x + w]
+
+  sct = _sct()
+  if region is None:
+    primary = sct.monitors[1]
+    monitor = {
+      "left": primary["left"],
+      "top": primary["top"],
+      "width": primary["width"],
+      "height": primary["height"]
+    }
+  else:
     monitor = {
       "left": region[0],
       "top": region[1],
       "width": region[2],
       "height": region[3]
     }
-    img = sct.grab(monitor)
-    img_np = np.array(img)
-    img_rgb = img_np[:, :, :3][:, :, ::-1]
-    pil_img = Image.fromarray(img_rgb)
+  img = np.asarray(sct.grab(monitor))
+  return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+
+def refresh_frame() -> np.ndarray:
+  """Capture a new shared frame, call it whenever the UI is expected to have changed."""
+  global _frame
+  _frame = grab_frame()
+  return _frame
+
+def release_frame():
+  """Drop the shared frame so the next reader grabs the screen again."""
+  global _frame
+  _frame = None
+
+def current_frame():
+  return _frame
+
+def crop_frame(region, frame=None) -> np.ndarray:
+  """
+  BGR view of region (left, top, width, height).
+  Crops the given or shared frame without copying, grabs the screen if there is none.
+  """
+  if frame is None:
+    frame = _frame
+  if frame is None:
+    return grab_frame(region)
+  x, y, w, h = (int(v) for v in region)
+  return frame[max(y, 0):y + h, max(x, 0):x + w]
+
+def crop_bbox(bbox, frame=None) -> np.ndarray:
+  """Same as crop_frame but with a (left, top, right, bottom) box."""
+  left, top, right, bottom = bbox
+  return crop_frame((left, top, right - left, bottom - top), frame)
+
+def enhanced_screenshot(region=(0, 0, 1920, 1080), frame=None) -> Image.Image:
+  pil_img = capture_region(region, frame)
 
   pil_img = pil_img.resize((pil_img.width * 2, pil_img.height * 2), Image.BICUBIC)
   pil_img = pil_img.convert("L")
@@ -22,18 +100,9 @@ def enhanced_screenshot(region=(0, 0, 1920, 1080)) -> Image.Image:
 
   return pil_img
 
-def capture_region(region=(0, 0, 1920, 1080)) -> Image.Image:
-  with mss.mss() as sct:
-    monitor = {
-      "left": region[0],
-      "top": region[1],
-      "width": region[2],
-      "height": region[3]
-    }
-    img = sct.grab(monitor)
-    img_np = np.array(img)
-    img_rgb = img_np[:, :, :3][:, :, ::-1]
-    return Image.fromarray(img_rgb)
+def capture_region(region=(0, 0, 1920, 1080), frame=None) -> Image.Image:
+  img = crop_frame(region, frame)
+  return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
 
 def enhance_image_for_ocr(image: Image.Image, scale: float = 3.0):
   img = np.array(image)
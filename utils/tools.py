@@ -1,13 +1,21 @@
 # tools
 import pyautogui
 import time
+import cv2
+import numpy as np
 import core.state as state
 
 from utils.log import info, warning, error, debug
+from utils.metrics import timed
+from utils.screenshot import grab_frame, release_frame
+from core.recognizer import locate, locate_center
 
 pyautogui.useImageNotFoundException(False)
 
+@timed("tools.sleep")
 def sleep(seconds=1):
+  # waiting means the UI is expected to change, drop the shared frame
+  release_frame()
   time.sleep(seconds * state.SLEEP_TIME_MULTIPLIER)
 
 def get_secs(seconds=1):
@@ -24,7 +32,9 @@ def drag_scroll(mousePos, to):
   pyautogui.moveRel(0, to, duration=0.25)
   pyautogui.mouseUp()
   pyautogui.click()
+  release_frame()
 
+@timed("tools.click")
 def click(img: str = None, confidence: float = 0.8, minSearch:float = 2, click: int = 1, text: str = "", boxes = None, region=None):
   if state.stop_event.is_set():
     return False
@@ -45,39 +55,95 @@ def click(img: str = None, confidence: float = 0.8, minSearch:float = 2, click:
     center = (x + w // 2, y + h // 2)
     pyautogui.moveTo(center[0], center[1], duration=0.225)
     pyautogui.click(clicks=click, interval=0.15)
+    release_frame()
     return True
 
   if img is None:
     return False
 
-  if region:
-    btn = pyautogui.locateCenterOnScreen(img, confidence=confidence, minSearchTime=minSearch, region=region)
-  else:
-    btn = pyautogui.locateCenterOnScreen(img, confidence=confidence, minSearchTime=minSearch)
+  btn = locate_center(img, confidence=confidence, min_search=minSearch, region=region)
   if btn:
     if text:
       debug(text)
     pyautogui.moveTo(btn, duration=0.225)
     pyautogui.click(clicks=click, interval=0.15)
+    release_frame()
     return True
 
   return False
 
+def _signature(region=None):
+  # tiny grayscale thumbnail, cheap enough to grab every few milliseconds
+  img = grab_frame(region)
+  gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+  return cv2.resize(gray, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+def _changed(prev, curr, threshold):
+  return prev is None or prev.shape != curr.shape or np.abs(curr - prev).mean() > threshold
+
+@timed("tools.wait_for_stable")
+def wait_for_stable(region=None, timeout=2, settle=0.15, threshold=2.0, interval=0.03) -> float:
+  """
+  Wait until region stops changing for settle seconds, or timeout.
+  region: (left, top, width, height), full screen if None.
+  Returns the seconds actually waited.
+  """
+  release_frame()
+  start = time.time()
+  deadline = start + get_secs(timeout)
+  prev = _signature(region)
+  still_since = time.time()
+
+  while time.time() < deadline and not state.stop_event.is_set():
+    time.sleep(interval)
+    curr = _signature(region)
+    if _changed(prev, curr, threshold):
+      still_since = time.time()
+    elif time.time() - still_since >= settle:
+      break
+    prev = curr
+
+  elapsed = time.time() - start
+  debug(f"Screen settled after {elapsed:.2f}s")
+  return elapsed
+
+@timed("tools.wait_for_screen")
+def wait_for_screen(img_path, timeout=10, confidence=0.8, region=None, interval=0.03, threshold=2.0, relocate=0.25):
+  """
+  Wait for img_path to appear. It is matched again whenever region changed since the last
+  match, and every relocate seconds regardless, so small buttons and slow fades are not missed.
+  Returns (box or None, seconds waited).
+  """
+  release_frame()
+  start = time.time()
+  deadline = start + get_secs(timeout)
+  # region signature and time of the last locate
+  located = None
+  located_at = None
+
+  while not state.stop_event.is_set():
+    curr = _signature(region)
+    now = time.time()
+    if _changed(located, curr, threshold) or now - located_at >= relocate:
+      box = locate(img_path, confidence=confidence, region=region)
+      if box:
+        return box, time.time() - start
+      located, located_at = curr, now
+    if now >= deadline:
+      break
+    time.sleep(interval)
+
+  return None, time.time() - start
+
 def wait_for_image(img_path, timeout=10, confidence=0.8, region=None, interval=0.15, minSearch:float = 2):
     """ 
     Returns:
         (True, box) if image found
         (False, None) if timeout
     """
-    start = time.time()
-
-    while time.time() - start < get_secs(timeout):
-        if region:
-            box = pyautogui.locateOnScreen(img_path, confidence=confidence, minSearchTime=minSearch, region=region)
-        else:
-            box = pyautogui.locateOnScreen(img_path, confidence=confidence, minSearchTime=minSearch)
-        if box:
-            return True, box
-        time.sleep(get_secs(interval))
-
-    return False, None
\ No newline at end of file
+    # like pyautogui's minSearchTime, the search never gives up before minSearch seconds
+    box, elapsed = wait_for_screen(img_path, timeout=max(timeout, minSearch), confidence=confidence, region=region, interval=get_secs(interval))
+    if box:
+        debug(f"{img_path} found after {elapsed:.2f}s")
+        return True, box
+    return False, None